@@ -0,0 +1,83 @@
+"""
+bench_audio_preprocessing.py — Whisper audio front-end: previous vs. current.
+
+For 8 / 16 / 44.1 / 48 kHz stereo WAV inputs, compares
+
+    previous — sf.read (float64) + np.mean downmix + librosa.resample
+    current  — src.audio_preprocessing.load_waveform (float32, in-place
+               downmix, cached polyphase filter)
+
+reporting mean wall time per call and peak traced memory (tracemalloc).
+
+Usage:
+    uv run python benchmarks/bench_audio_preprocessing.py [--seconds 30] [--repeats 10]
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src import audio_preprocessing  # noqa: E402
+
+
+def _previous(audio_bytes: bytes) -> np.ndarray:
+    import librosa
+
+    waveform, sample_rate = sf.read(io.BytesIO(audio_bytes))
+    if len(waveform.shape) > 1:
+        waveform = np.mean(waveform, axis=1)
+    if sample_rate != 16000:
+        waveform = librosa.resample(waveform, orig_sr=sample_rate, target_sr=16000)
+    return waveform
+
+
+def _make_wav(sample_rate: int, seconds: float) -> bytes:
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    tone = 0.3 * np.sin(2 * np.pi * 440 * t)
+    noise = 0.05 * np.random.default_rng(0).standard_normal(t.shape)
+    stereo = np.stack([tone + noise, tone - noise], axis=1).astype(np.float32)
+    buf = io.BytesIO()
+    sf.write(buf, stereo, sample_rate, format="WAV", subtype="PCM_16")
+    return buf.getvalue()
+
+
+def _measure(fn, audio_bytes: bytes, repeats: int) -> tuple[float, float]:
+    fn(audio_bytes)  # warm-up: imports, filter caches
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(audio_bytes)
+    per_call = (time.perf_counter() - start) / repeats
+
+    tracemalloc.start()
+    fn(audio_bytes)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return per_call, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    for sample_rate in (8000, 16000, 44100, 48000):
+        audio_bytes = _make_wav(sample_rate, args.seconds)
+        for name, fn in (("previous", _previous), ("current", audio_preprocessing.load_waveform)):
+            per_call, peak = _measure(fn, audio_bytes, args.repeats)
+            print(
+                f"{sample_rate:>6} Hz  {name:>8}: "
+                f"{per_call * 1000:8.2f} ms/call  peak {peak / 2**20:7.2f} MiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
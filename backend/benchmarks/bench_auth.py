@@ -0,0 +1,116 @@
+"""
+bench_auth.py — per-request overhead of get_current_user.
+
+Starts a local stand-in for the Supabase auth endpoint (GET /auth/v1/user,
+with a configurable artificial latency) and compares:
+
+    remote   — every request calls supabase.auth.get_user (previous behaviour)
+    local    — HS256 signature/expiry checked in-process, no cache
+    cached   — local verification plus the token-hash TTL cache
+
+Usage:
+    uv run python benchmarks/bench_auth.py [--requests 500] [--latency-ms 40]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_SECRET = "bench-secret-not-for-production-use-0123456789"
+_USER_ID = str(uuid.uuid4())
+
+
+def _start_stub_auth_server(latency_s: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency_s)
+            body = json.dumps({
+                "id": _USER_ID,
+                "aud": "authenticated",
+                "role": "authenticated",
+                "email": "bench@example.com",
+                "app_metadata": {},
+                "user_metadata": {},
+                "created_at": "2024-01-01T00:00:00Z",
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _make_request(token: str):
+    from starlette.requests import Request
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/chat",
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+    }
+    return Request(scope)
+
+
+async def _run(auth, token: str, n: int) -> float:
+    request = _make_request(token)
+    start = time.perf_counter()
+    for _ in range(n):
+        user_id = await auth.get_current_user(request)
+        assert user_id == _USER_ID
+    return (time.perf_counter() - start) / n
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    args = parser.parse_args()
+
+    server = _start_stub_auth_server(args.latency_ms / 1000)
+    os.environ["SUPABASE_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ["SUPABASE_KEY"] = "bench-anon-key"
+    os.environ["SUPABASE_JWT_SECRET"] = _SECRET
+
+    from src import auth
+
+    token = jwt.encode(
+        {"sub": _USER_ID, "aud": "authenticated", "exp": int(time.time()) + 3600},
+        _SECRET,
+        algorithm="HS256",
+    )
+
+    modes = {
+        "remote": (False, 0),
+        "local": (True, 0),
+        "cached": (True, 1024),
+    }
+    for name, (local_verify, cache_size) in modes.items():
+        auth._LOCAL_VERIFY = local_verify
+        auth._token_cache = auth.TokenCache(max_size=cache_size)
+        n = args.requests if name != "remote" else min(args.requests, 100)
+        per_request = asyncio.run(_run(auth, token, n))
+        print(f"{name:>7}: {per_request * 1e6:10.1f} µs/request  ({n} requests)")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+bench_chunking.py — PDF chunkers: throughput, chunk sizes and retrieval hit rate.
+
+Compares, on the same extracted text,
+
+    recursive-chars  — pdf_processor.chunk_text (RAG_CHUNK_SIZE characters)
+    recursive-tokens — RecursiveCharacterTextSplitter sized with the embedding
+                       tokenizer (RAG_CHUNK_TOKENS), the usual drop-in fix
+    layout-tokens    — pdf_processor.iter_chunks (LayoutChunker over PyMuPDF
+                       blocks, RAG_CHUNK_TOKENS)
+
+reporting chunking throughput (extraction excluded), chunk count, mean
+tokens, the share of chunks longer than the model's input window (which
+the model silently truncates), and hit@k: for sentences sampled from the
+document, how often a chunk containing the whole sentence is among the
+top-k results when the sentence itself is the query.
+
+Without --pdf, a synthetic lecture-notes PDF with paragraphs and tables is
+generated.
+
+Usage:
+    uv run python benchmarks/bench_chunking.py \
+        [--pdf notes.pdf] [--pages 200] [--queries 200] [--top-k 5] [--repeats 3]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import textwrap
+import time
+
+import fitz
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.providers.huggingface_embedding_provider import HuggingFaceEmbeddingProvider  # noqa: E402
+from src.rag import chunker, pdf_processor  # noqa: E402
+
+_TOPICS = ["photosynthesis", "mitosis", "entropy", "inflation", "recursion", "plate tectonics",
+           "supply chains", "the immune response", "neural networks", "the French Revolution"]
+_VERBS = ["depends on", "is limited by", "accelerates", "is measured through", "explains",
+          "is often confused with", "reduces", "was first described alongside"]
+_OBJECTS = ["temperature", "available energy", "the sample size", "feedback loops", "market demand",
+            "cell division", "memory usage", "regional trade", "light intensity", "public debt"]
+
+
+def _synthetic_pdf(pages: int) -> bytes:
+    rng = random.Random(0)
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page()
+        y = 60
+        page.insert_text((50, y), f"Lecture {number + 1}: {rng.choice(_TOPICS).title()}", fontsize=14)
+        y += 30
+        for paragraph in range(3):
+            sentences = [
+                f"In section {number + 1}.{paragraph + 1}, {rng.choice(_TOPICS)} "
+                f"{rng.choice(_VERBS)} {rng.choice(_OBJECTS)} when {rng.choice(_OBJECTS)} "
+                f"{rng.choice(_VERBS)} {rng.choice(_OBJECTS)}."
+                for _ in range(rng.randint(3, 6))
+            ]
+            for line in textwrap.wrap(" ".join(sentences), 95):
+                page.insert_text((50, y), line, fontsize=9)
+                y += 11
+            y += 14
+        for row in range(6):
+            cells = [f"Item {row + 1}", rng.choice(_OBJECTS), f"{rng.uniform(0, 100):.2f}"]
+            for x, cell in zip((50, 150, 400), cells):
+                page.insert_text((x, y), cell, fontsize=9)
+            y += 11
+    return doc.tobytes()
+
+
+def _normalise(text: str) -> str:
+    return " ".join(text.split())
+
+
+def _sample_sentences(page_texts, count: int, seed: int = 0):
+    sentences = [
+        sentence
+        for text in page_texts
+        for sentence in re.split(r"(?<=[.!?])\s+", _normalise(text))
+        if 8 <= len(sentence.split()) <= 40
+    ]
+    return random.Random(seed).sample(sentences, min(count, len(sentences)))
+
+
+def _timed(fn, repeats: int):
+    result = fn()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return result, (time.perf_counter() - start) / repeats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pdf", help="PDF to chunk (default: synthetic)")
+    parser.add_argument("--pages", type=int, default=200, help="synthetic PDF length")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.pdf:
+        with open(args.pdf, "rb") as f:
+            pdf_bytes = f.read()
+        name = os.path.basename(args.pdf)
+    else:
+        pdf_bytes = _synthetic_pdf(args.pages)
+        name = "synthetic.pdf"
+
+    blocks = list(pdf_processor.iter_page_blocks(pdf_bytes, name))
+    page_texts = ["\n".join(page) for _, page in blocks]
+    full_text = "\n\n".join(text for text in page_texts if text.strip())
+
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from sentence_transformers import SentenceTransformer
+
+    provider = HuggingFaceEmbeddingProvider()
+    tokenizer = provider.get_tokenizer()
+    model = SentenceTransformer(provider.model_name, device="cpu")
+    counter = chunker.TokenCounter(tokenizer)
+    token_splitter = RecursiveCharacterTextSplitter.from_huggingface_tokenizer(
+        tokenizer,
+        chunk_size=chunker.CHUNK_TOKENS,
+        chunk_overlap=chunker.CHUNK_OVERLAP_TOKENS,
+        separators=["\n\n", "\n", ". ", " ", ""],
+    )
+
+    chunkers = {
+        "recursive-chars": lambda: [d.page_content for d in pdf_processor.chunk_text(full_text, name)],
+        "recursive-tokens": lambda: token_splitter.split_text(full_text),
+        "layout-tokens": lambda: [
+            d.page_content for d in pdf_processor.iter_chunks(iter(blocks), name, counter)
+        ],
+    }
+
+    queries = _sample_sentences(page_texts, args.queries)
+    query_vectors = model.encode(queries, normalize_embeddings=True, convert_to_numpy=True)
+    window = model.max_seq_length - 2
+
+    print(
+        f"{name}: {len(blocks)} pages, {len(full_text) / 1e6:.2f} M chars, "
+        f"{len(queries)} queries, model window {window} tokens"
+    )
+    for label, run in chunkers.items():
+        chunks, seconds = _timed(run, args.repeats)
+        sizes = [len(spans) for spans in counter.spans(chunks)]
+        truncated = sum(size > window for size in sizes) / len(sizes)
+
+        vectors = model.encode(chunks, normalize_embeddings=True, convert_to_numpy=True, batch_size=64)
+        top = np.argsort(-(query_vectors @ vectors.T), axis=1)[:, :args.top_k]
+        normalised = [_normalise(chunk) for chunk in chunks]
+        hits = sum(
+            any(query in normalised[row] for row in rows)
+            for query, rows in zip(queries, top)
+        )
+
+        print(
+            f"  {label:>16}: {len(blocks) / seconds:8.0f} pages/s  "
+            f"{len(chunks):6d} chunks  mean {np.mean(sizes):6.1f} tokens  "
+            f"truncated {truncated:6.1%}  hit@{args.top_k} {hits / max(1, len(queries)):6.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
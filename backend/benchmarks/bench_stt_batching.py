@@ -0,0 +1,74 @@
+"""
+bench_stt_batching.py — Whisper throughput vs. p95 latency under micro-batching.
+
+Loads WhisperSTTProvider once per configuration and fires `--requests`
+transcriptions from `--concurrency` client threads, mimicking the STT worker
+pool. Prints requests/second and latency percentiles for each
+STT_BATCH_MAX_SIZE / STT_BATCH_MAX_WAIT_MS combination.
+
+Usage:
+    uv run python benchmarks/bench_stt_batching.py --audio sample.wav \
+        [--requests 64] [--concurrency 8] [--batch-sizes 1,2,4,8] [--wait-ms 10,20,50]
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.providers.whisper_stt_provider import WhisperSTTProvider  # noqa: E402
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def _run(audio: bytes, batch_size: int, wait_ms: float, requests: int, concurrency: int):
+    os.environ["STT_BATCH_MAX_SIZE"] = str(batch_size)
+    os.environ["STT_BATCH_MAX_WAIT_MS"] = str(wait_ms)
+    provider = WhisperSTTProvider()
+    provider._load_model()
+    provider.transcribe_audio_bytes(audio)  # warm-up, not measured
+
+    def one(_):
+        start = time.perf_counter()
+        provider.transcribe_audio_bytes(audio)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"batch={batch_size:2d} wait={wait_ms:5.1f}ms  "
+        f"{requests / elapsed:6.2f} req/s  "
+        f"p50={_percentile(latencies, 50) * 1000:7.1f} ms  "
+        f"p95={_percentile(latencies, 95) * 1000:7.1f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--audio", required=True)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-sizes", default="1,2,4,8")
+    parser.add_argument("--wait-ms", default="10,20,50")
+    args = parser.parse_args()
+
+    with open(args.audio, "rb") as f:
+        audio = f.read()
+
+    for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+        waits = [0.0] if batch_size == 1 else [float(w) for w in args.wait_ms.split(",")]
+        for wait_ms in waits:
+            _run(audio, batch_size, wait_ms, args.requests, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
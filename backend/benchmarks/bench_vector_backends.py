@@ -0,0 +1,128 @@
+"""
+bench_vector_backends.py — Chroma vs. NumPy brute-force index: latency and memory.
+
+For 1k / 10k / 100k random unit vectors (384-dim, the default MiniLM size),
+loads one user's corpus into each backend and reports
+
+    build  — time to insert every chunk
+    query  — p50 / p95 top-k search latency
+    memory — resident-set growth of a fresh process holding the index
+
+Each (backend, size) pair runs in its own subprocess so RSS numbers are not
+polluted by earlier runs. Embedding time is excluded: vectors are precomputed.
+
+Usage:
+    uv run python benchmarks/bench_vector_backends.py \
+        [--sizes 1000,10000,100000] [--dim 384] [--queries 200] [--top-k 5]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_BATCH = 5000  # Chroma's add() rejects very large batches
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+
+        # ru_maxrss is KiB on Linux, bytes on macOS — peak rather than current.
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def _vectors(n: int, dim: int, seed: int) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def _run(backend: str, size: int, dim: int, queries: int, top_k: int, out) -> None:
+    corpus = _vectors(size, dim, seed=0)
+    probes = _vectors(queries, dim, seed=1)
+    texts = [f"chunk {i}" for i in range(size)]
+    metadatas = [{"source": "bench.pdf"} for _ in range(size)]
+
+    baseline = _rss_bytes()
+    start = time.perf_counter()
+    if backend == "chroma":
+        import chromadb
+
+        collection = chromadb.EphemeralClient().get_or_create_collection("user_bench")
+        for i in range(0, size, _BATCH):
+            collection.add(
+                ids=[str(j) for j in range(i, min(i + _BATCH, size))],
+                documents=texts[i:i + _BATCH],
+                metadatas=metadatas[i:i + _BATCH],
+                embeddings=corpus[i:i + _BATCH],
+            )
+
+        def search(q):
+            return collection.query(
+                query_embeddings=[q], n_results=top_k,
+                include=["documents", "metadatas", "distances"],
+            )
+    else:
+        from src.rag.numpy_index import NumpyVectorIndex
+
+        index = NumpyVectorIndex(backend.split("-")[1])
+        for i in range(0, size, _BATCH):
+            index.add("bench", texts[i:i + _BATCH], metadatas[i:i + _BATCH], corpus[i:i + _BATCH])
+
+        def search(q):
+            return index.search("bench", q, top_k)
+    build = time.perf_counter() - start
+
+    del corpus
+    search(probes[0])  # warm-up
+    latencies = []
+    for q in probes:
+        t = time.perf_counter()
+        search(q)
+        latencies.append((time.perf_counter() - t) * 1000)
+
+    out.send((build, _percentile(latencies, 50), _percentile(latencies, 95), _rss_bytes() - baseline))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        for backend in ("chroma", "numpy-float32", "numpy-float16"):
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            proc = multiprocessing.Process(
+                target=_run, args=(backend, size, args.dim, args.queries, args.top_k, sender)
+            )
+            proc.start()
+            build, p50, p95, rss = receiver.recv()
+            proc.join()
+            print(
+                f"{size:>7} chunks  {backend:>13}: "
+                f"build {build:7.2f} s  "
+                f"query p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  "
+                f"rss +{rss / 2**20:8.1f} MiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
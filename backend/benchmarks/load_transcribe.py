@@ -0,0 +1,107 @@
+"""
+load_transcribe.py — request latency on a running server while /transcribe is busy.
+
+Fires a steady stream of concurrent /transcribe uploads and, at the same time,
+probes a second endpoint (default /ready, or /chat with --chat) at a fixed
+interval. Reports probe latency percentiles with and without the transcription
+load, plus how many uploads were accepted vs. rejected with 503.
+
+Before the STT worker pool, every transcription blocked the event loop, so
+probe latency tracked inference time; with the pool it should stay flat.
+
+Usage:
+    uv run python benchmarks/load_transcribe.py --token <JWT> --audio sample.wav \
+        [--url http://localhost:8000] [--concurrency 4] [--duration 30] [--chat]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def _percentile(values, pct):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def _probe(client, args, headers, stop: asyncio.Event, latencies: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        if args.chat:
+            await client.post("/chat", headers=headers, json={"message": "Say OK."})
+        else:
+            await client.get("/ready")
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(args.probe_interval)
+
+
+async def _transcribe_worker(client, headers, audio: bytes, stop: asyncio.Event, counts: dict):
+    while not stop.is_set():
+        files = {"audio_file": ("sample.wav", audio, "audio/wav")}
+        response = await client.post("/transcribe", headers=headers, files=files)
+        counts[response.status_code] = counts.get(response.status_code, 0) + 1
+        if response.status_code == 503:
+            await asyncio.sleep(0.5)
+
+
+async def _phase(args, audio: bytes | None) -> tuple[list, dict]:
+    headers = {"Authorization": f"Bearer {args.token}"}
+    stop = asyncio.Event()
+    latencies: list = []
+    counts: dict = {}
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=300) as client:
+        tasks = [asyncio.create_task(_probe(client, args, headers, stop, latencies))]
+        if audio is not None:
+            tasks += [
+                asyncio.create_task(_transcribe_worker(client, headers, audio, stop, counts))
+                for _ in range(args.concurrency)
+            ]
+        await asyncio.sleep(args.duration)
+        stop.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    return latencies, counts
+
+
+def _report(label: str, latencies: list) -> None:
+    print(
+        f"{label:>18}: n={len(latencies):4d}  "
+        f"p50={_percentile(latencies, 50):8.1f} ms  "
+        f"p95={_percentile(latencies, 95):8.1f} ms  "
+        f"max={max(latencies, default=float('nan')):8.1f} ms  "
+        f"mean={statistics.fmean(latencies) if latencies else float('nan'):8.1f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True, help="Supabase access token")
+    parser.add_argument("--audio", required=True, help="Audio file to upload")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--probe-interval", type=float, default=0.2)
+    parser.add_argument("--chat", action="store_true", help="Probe /chat instead of /ready")
+    args = parser.parse_args()
+
+    with open(args.audio, "rb") as f:
+        audio = f.read()
+
+    idle, _ = asyncio.run(_phase(args, None))
+    loaded, counts = asyncio.run(_phase(args, audio))
+
+    probe = "/chat" if args.chat else "/ready"
+    _report(f"{probe} idle", idle)
+    _report(f"{probe} under STT", loaded)
+    print(f"/transcribe responses by status: {dict(sorted(counts.items()))}")
+
+
+if __name__ == "__main__":
+    main()
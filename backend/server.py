@@ -1,25 +1,48 @@
+import json
+
 from dotenv import load_dotenv
-from fastapi import FastAPI, Request, UploadFile, File, HTTPException, Depends
+from fastapi import FastAPI, Request, UploadFile, File, Form, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from contextlib import asynccontextmanager
 
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-
 from src.auth import get_current_user
+from src.memory import empty_stats
 from src.session_manager import session_manager
-from src.speech_to_text import get_speech_processor, is_speech_model_ready
+from src.speech_to_text import (
+    MAX_AUDIO_SIZE_BYTES,
+    TranscriptionQueueFull,
+    get_queue_depth,
+    get_speech_model_status,
+    get_speech_processor,
+    is_speech_model_ready,
+    transcribe_async,
+)
+from src.rag.ingest_jobs import IngestJob, IngestQueueFull, ingest_jobs
 from src.rag.rag_pipeline import rag_pipeline
-from src.rag.pdf_processor import PDFValidationError
+from src.rag.pdf_processor import (
+    MAX_PDF_SIZE_BYTES,
+    PDFValidationError,
+    shutdown_extract_pool,
+    start_extract_pool,
+)
+from src.uploads import UploadTooLarge, close_upload, spool_upload
 
 load_dotenv()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Before any worker threads are started: extraction workers are forked.
+    start_extract_pool()
     speech_processor = get_speech_processor()
     speech_processor.load_model_async()
+    rag_pipeline.load_embeddings_async()
+    rag_pipeline.restore_metadata()
+    ingest_jobs.start()
     yield
+    await ingest_jobs.stop()
+    shutdown_extract_pool()
     del speech_processor
 
 
@@ -40,7 +63,15 @@ app.add_middleware(
 
 @app.get("/ready")
 async def ready_check():
-    return {"status": "ready", "speech_model_ready": is_speech_model_ready()}
+    return {
+        "status": "ready",
+        "speech_model_ready": is_speech_model_ready(),
+        "speech_queue_depth": get_queue_depth(),
+        "speech_model": get_speech_model_status(),
+        "embedding_model_ready": rag_pipeline.is_embedding_model_ready(),
+        "embedding_model": rag_pipeline.get_embedding_model_status(),
+        "embedding_cache": rag_pipeline.get_embedding_cache_stats(),
+    }
 
 
 # ---------------------------------------------------------------------------
@@ -53,15 +84,29 @@ async def reset_endpoint(user_id: str = Depends(get_current_user)):
     return JSONResponse({"status": "reset"})
 
 
+# ---------------------------------------------------------------------------
+# Session stats — prompt-size metrics for the calling user's session
+# ---------------------------------------------------------------------------
+
+@app.get("/session-stats")
+async def session_stats_endpoint(user_id: str = Depends(get_current_user)):
+    # Reading stats must not create (or keep alive) a session.
+    agent = session_manager.get_session(user_id)
+    return JSONResponse(agent.window.stats if agent is not None else empty_stats())
+
+
 # ---------------------------------------------------------------------------
 # Chat — main endpoint, fully authenticated and per-user
 # ---------------------------------------------------------------------------
 
-@app.post("/chat")
-async def chat_endpoint(
-    request: Request,
-    user_id: str = Depends(get_current_user),
-):
+async def _prepare_chat(request: Request, user_id: str):
+    """
+    Shared request handling for /chat and /chat/stream.
+
+    Returns:
+        (agent, user_input, jwt, early_response). When early_response is not
+        None the request is answered without calling the agent.
+    """
     # Extract the raw JWT to pass to tools that write to Supabase.
     auth_header = request.headers.get("Authorization", "")
     jwt = auth_header.removeprefix("Bearer ").strip()
@@ -77,29 +122,16 @@ async def chat_endpoint(
     agent = session_manager.get_or_create_session(user_id)
 
     # If the frontend is sending prior chat history (e.g. on page reload),
-    # rebuild the agent's memory from it so context is preserved.
+    # sync the agent's memory with it so context is preserved. Histories the
+    # agent has already seen are skipped or only have their new tail appended.
     if chat_history:
-        agent.memory = agent.memory.__class__(
-            memory_key="chat_history", return_messages=True
-        )
-        agent.memory.chat_memory.messages.clear()
-
-        # Re-add system prompt at the top of rebuilt history.
-        from src.client import _SYSTEM_PROMPT
-        agent.memory.chat_memory.add_message(SystemMessage(content=_SYSTEM_PROMPT))
-
-        for msg in chat_history:
-            if msg.get("sender") == "user":
-                agent.memory.chat_memory.add_message(HumanMessage(content=msg.get("text", "")))
-            elif msg.get("sender") == "bot":
-                agent.memory.chat_memory.add_message(AIMessage(content=msg.get("text", "")))
+        agent.sync_history(chat_history)
 
     if quiz_report:
-        response = await agent.process_query({"quizReport": quiz_report}, user_id=user_id, jwt=jwt)
-        return response
+        return agent, {"quizReport": quiz_report}, jwt, None
 
     if not message:
-        return {"error": "Message required"}
+        return agent, None, jwt, {"error": "Message required"}
 
     content = {"text": message}
     if image_base64:
@@ -108,8 +140,18 @@ async def chat_endpoint(
     # If the /uploads prefix was used, retrieve relevant document context
     # and prepend it to the user's message before invoking the agent.
     if use_rag:
-        if rag_pipeline.get_pdf_count(user_id) == 0:
-            return {
+        if not rag_pipeline.get_pdf_list(user_id) and rag_pipeline.get_pending_upload_count(user_id):
+            return agent, None, jwt, {
+                "text": (
+                    "Your PDF is still being processed. "
+                    "Please ask again with the `/uploads` prefix once the upload has finished."
+                ),
+                "image": "",
+                "quiz": None,
+            }
+
+        if not rag_pipeline.get_pdf_list(user_id):
+            return agent, None, jwt, {
                 "text": (
                     "You haven't uploaded any PDF documents yet. "
                     "Use the PDF upload button to add documents, then ask your question with the `/uploads` prefix."
@@ -122,7 +164,7 @@ async def chat_endpoint(
             context = await rag_pipeline.retrieve_context(user_id, message)
         except Exception as e:
             print(f"[/chat] RAG retrieval error for user {user_id}: {e}")
-            return {
+            return agent, None, jwt, {
                 "text": (
                     "Sorry, I ran into a problem searching your documents. "
                     "This is usually a temporary issue — please try again in a moment."
@@ -132,7 +174,7 @@ async def chat_endpoint(
             }
 
         if context is None:
-            return {
+            return agent, None, jwt, {
                 "text": (
                     "I couldn't find relevant information in your uploaded documents for that question. "
                     "Try rephrasing, or ask without the `/uploads` prefix for a general answer."
@@ -144,27 +186,63 @@ async def chat_endpoint(
         # Prepend the retrieved context to the user's message text.
         content["text"] = context + message
 
-    response = await agent.process_query(content, user_id=user_id, jwt=jwt)
+    return agent, content, jwt, None
+
+
+@app.post("/chat")
+async def chat_endpoint(
+    request: Request,
+    user_id: str = Depends(get_current_user),
+):
+    agent, user_input, jwt, early_response = await _prepare_chat(request, user_id)
+    if early_response is not None:
+        return early_response
+
+    response = await agent.process_query(user_input, user_id=user_id, jwt=jwt)
     return response
 
 
 # ---------------------------------------------------------------------------
-# Upload PDF — ingest a PDF into the user's RAG vector store
+# Chat (streaming) — same contract as /chat, delivered as Server-Sent Events
 # ---------------------------------------------------------------------------
 
-@app.post("/upload-pdf")
-async def upload_pdf_endpoint(
-    file: UploadFile = File(...),
+def _sse(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(
+    request: Request,
     user_id: str = Depends(get_current_user),
 ):
     """
-    Accept a PDF file upload, validate it, extract text, chunk it, embed it,
-    and store the embeddings in the user's ChromaDB collection.
+    Streaming variant of /chat.
 
-    Limits (configurable via env vars):
-        MAX_PDF_COUNT   - max PDFs per session (default: 2)
-        MAX_PDF_SIZE_MB - max file size in MB (default: 10)
+    Emits "token" events as the model generates text, then "image", "quiz",
+    "notes" or "tool_error" events as tool calls resolve, and finally a
+    "done" event carrying the same {text, image, quiz} body /chat returns.
     """
+    agent, user_input, jwt, early_response = await _prepare_chat(request, user_id)
+
+    async def event_stream():
+        if early_response is not None:
+            yield _sse("done", early_response)
+            return
+        async for event, payload in agent.stream_query(user_input, user_id=user_id, jwt=jwt):
+            yield _sse(event, payload)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ---------------------------------------------------------------------------
+# Upload PDF — ingest a PDF into the user's RAG vector store
+# ---------------------------------------------------------------------------
+
+def _check_pdf_content_type(file: UploadFile) -> None:
     # Validate MIME type early before reading the full file.
     if file.content_type not in ("application/pdf", "application/octet-stream"):
         raise HTTPException(
@@ -172,29 +250,129 @@ async def upload_pdf_endpoint(
             detail="Only PDF files are accepted. Please upload a .pdf file.",
         )
 
-    pdf_bytes = await file.read()
+
+def _upload_body(result: dict) -> dict:
+    return {
+        "status": "ingested",
+        "filename": result["filename"],
+        "chunks": result["chunks"],
+        "pdf_count": result["pdf_count"],
+    }
+
+
+async def _submit_pdf_job(file: UploadFile, user_id: str) -> IngestJob:
+    """Validate an upload and queue it, mapping failures to HTTP errors."""
+    _check_pdf_content_type(file)
+
+    # Spooled to disk and capped while it is received; the job releases the
+    # file once ingestion finishes.
+    try:
+        pdf_bytes = await spool_upload(file, MAX_PDF_SIZE_BYTES, suffix=".pdf")
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=f"'{file.filename}': {e}")
 
     try:
-        result = await rag_pipeline.ingest_pdf(
+        return ingest_jobs.submit(
             user_id=user_id,
             pdf_bytes=pdf_bytes,
             filename=file.filename or "document.pdf",
         )
     except PDFValidationError as e:
+        close_upload(pdf_bytes)
         raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        print(f"[upload-pdf] Unexpected error for user {user_id}: {e}")
+    except IngestQueueFull:
+        close_upload(pdf_bytes)
         raise HTTPException(
-            status_code=500,
-            detail=f"Failed to process PDF: {str(e)}",
+            status_code=503,
+            detail="PDF processing is busy. Please try again in a few seconds.",
+            headers={"Retry-After": "5"},
         )
 
-    return JSONResponse({
-        "status": "ingested",
-        "filename": result["filename"],
-        "chunks": result["chunks"],
-        "pdf_count": result["pdf_count"],
-    })
+
+def _job_body(job: IngestJob) -> dict:
+    body = job.to_dict()
+    body["queue_position"] = ingest_jobs.queue_position(job)
+    if job.result is not None:
+        body["result"] = _upload_body(job.result)
+    return body
+
+
+@app.post("/upload-pdf", status_code=202)
+async def upload_pdf_endpoint(
+    file: UploadFile = File(...),
+    user_id: str = Depends(get_current_user),
+):
+    """
+    Accept a PDF file upload, validate it and queue it for ingestion.
+
+    Returns 202 with a job id as soon as the upload has been validated; the
+    extract → chunk → embed → store work runs in the background. Poll
+    /upload-pdf/jobs/{job_id} until its status is "done" or "failed".
+    Queued PDFs already count towards MAX_PDF_COUNT.
+
+    Limits (configurable via env vars):
+        MAX_PDF_COUNT   - max PDFs per session (default: 2)
+        MAX_PDF_SIZE_MB - max file size in MB (default: 10)
+    """
+    job = await _submit_pdf_job(file, user_id)
+    return JSONResponse(
+        {
+            "status": "queued",
+            "job_id": job.id,
+            "filename": job.filename,
+            "pdf_count": rag_pipeline.get_pdf_count(user_id),
+        },
+        status_code=202,
+    )
+
+
+@app.get("/upload-pdf/jobs")
+async def upload_jobs_endpoint(user_id: str = Depends(get_current_user)):
+    """List the calling user's ingestion jobs (finished ones for INGEST_JOB_TTL_SECONDS)."""
+    return JSONResponse({"jobs": [_job_body(job) for job in ingest_jobs.list_jobs(user_id)]})
+
+
+@app.get("/upload-pdf/jobs/{job_id}")
+async def upload_job_endpoint(job_id: str, user_id: str = Depends(get_current_user)):
+    """
+    Status of one ingestion job: queued (with queue_position), running (with
+    progress counters), done (with the same result body /upload-pdf used to
+    return) or failed (with error and status_code).
+    """
+    job = ingest_jobs.get(user_id, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Upload job not found.")
+    return JSONResponse(_job_body(job))
+
+
+@app.post("/upload-pdf/stream")
+async def upload_pdf_stream_endpoint(
+    file: UploadFile = File(...),
+    user_id: str = Depends(get_current_user),
+):
+    """
+    Streaming variant of /upload-pdf.
+
+    Queues the upload like /upload-pdf, then emits a "progress" event after
+    every batch of chunks is stored (see RAGPipeline.ingest_pdf for the
+    counters), and finally either a "done" event with the ingestion result
+    or an "error" event carrying status_code and detail. Disconnecting does
+    not cancel the job.
+    """
+    job = await _submit_pdf_job(file, user_id)
+
+    async def event_stream():
+        yield _sse("queued", {"job_id": job.id, "queue_position": ingest_jobs.queue_position(job)})
+        async for event, payload in ingest_jobs.watch(job):
+            if event == "done":
+                payload = _upload_body(payload)
+            yield _sse(event, payload)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -218,12 +396,23 @@ async def uploaded_pdfs_endpoint(user_id: str = Depends(get_current_user)):
 @app.post("/transcribe")
 async def transcribe_endpoint(
     audio_file: UploadFile = File(...),
+    mode: str = Form("short"),
     user_id: str = Depends(get_current_user),  # Enforces auth even for STT
 ):
+    """
+    Transcribe an uploaded audio clip.
+
+    mode="short" (default) transcribes a single pass, which Whisper limits to
+    the first 30 s. mode="long" decodes the recording in overlapping windows
+    and stitches the results, for lectures and other long recordings.
+    """
     try:
         if not audio_file:
             raise HTTPException(status_code=400, detail="Audio file required")
 
+        if mode not in ("short", "long"):
+            raise HTTPException(status_code=400, detail="mode must be 'short' or 'long'")
+
         if not audio_file.content_type.startswith("audio/"):
             raise HTTPException(status_code=400, detail="File must be an audio file")
 
@@ -233,13 +422,25 @@ async def transcribe_endpoint(
                 detail="Speech-to-text model is still loading. Please try again soon.",
             )
 
-        audio_content = await audio_file.read()
+        try:
+            audio_content = await spool_upload(audio_file, MAX_AUDIO_SIZE_BYTES)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
 
-        speech_processor = get_speech_processor()
-        transcription = speech_processor.transcribe_audio_bytes(audio_content)
+        # Runs on the dedicated STT worker pool so inference never blocks
+        # the event loop; rejected outright when the queue is full. The
+        # spooled file is released by transcribe_async when the worker is
+        # done with it.
+        transcription = await transcribe_async(audio_content, long_audio=mode == "long")
 
         return {"text": transcription, "success": True}
 
+    except TranscriptionQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Speech-to-text is busy. Please try again in a few seconds.",
+            headers={"Retry-After": "5"},
+        )
     except HTTPException:
         raise
     except Exception as e:
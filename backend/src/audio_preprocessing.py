@@ -0,0 +1,119 @@
+"""
+audio_preprocessing.py — decode, downmix and resample audio for speech models.
+
+Everything stays float32 end-to-end (half the memory of soundfile's default
+float64), multi-channel audio is downmixed in place, and resampling uses a
+polyphase FIR filter that is designed once per (source rate, target rate)
+pair and cached, instead of being rebuilt on every request.
+
+Browser recordings in WebM/Opus (MediaRecorder's default) are not readable by
+libsndfile. If PyAV is installed (`pip install av`) they are decoded directly;
+otherwise such uploads fail with soundfile's error, as before.
+"""
+
+from functools import lru_cache
+from math import gcd
+from typing import Tuple
+
+import numpy as np
+import soundfile as sf
+from scipy.signal import firwin, resample_poly
+
+try:
+    import av
+except ImportError:  # Optional: only needed for WebM/Opus uploads.
+    av = None
+
+from .uploads import readable
+
+TARGET_SAMPLE_RATE = 16000
+
+
+@lru_cache(maxsize=16)
+def _polyphase_filter(orig_sr: int, target_sr: int) -> Tuple[int, int, np.ndarray]:
+    """
+    Design (once) the anti-aliasing filter for an orig_sr → target_sr resample.
+
+    Mirrors scipy.signal.resample_poly's default Kaiser-windowed design, so
+    output matches an uncached resample_poly call.
+
+    Returns:
+        (up, down, taps) — taps are float32 and must not be modified.
+    """
+    divisor = gcd(orig_sr, target_sr)
+    up, down = target_sr // divisor, orig_sr // divisor
+    max_rate = max(up, down)
+    taps = firwin(2 * 10 * max_rate + 1, 1.0 / max_rate, window=("kaiser", 5.0))
+    taps = taps.astype(np.float32)
+    taps.setflags(write=False)
+    return up, down, taps
+
+
+def to_mono(waveform: np.ndarray) -> np.ndarray:
+    """
+    Downmix (frames, channels) audio to mono, reusing the first channel's buffer.
+
+    Channels are summed into column 0 in place, so no second full-size array
+    is allocated; only the final contiguous copy of one channel is.
+    """
+    if waveform.ndim == 1:
+        return waveform
+    channels = waveform.shape[1]
+    mono = waveform[:, 0]
+    for channel in range(1, channels):
+        mono += waveform[:, channel]
+    mono *= np.float32(1.0 / channels)
+    return np.ascontiguousarray(mono)
+
+
+def resample(waveform: np.ndarray, orig_sr: int, target_sr: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+    """Resample a mono float32 waveform using the cached polyphase filter."""
+    if orig_sr == target_sr:
+        return waveform
+    up, down, taps = _polyphase_filter(orig_sr, target_sr)
+    return resample_poly(waveform, up, down, window=taps).astype(np.float32, copy=False)
+
+
+def _decode_with_av(audio_bytes: bytes) -> Tuple[np.ndarray, int]:
+    """Decode any FFmpeg-supported container straight to 16 kHz mono float32."""
+    with av.open(readable(audio_bytes)) as container:
+        resampler = av.AudioResampler(format="flt", layout="mono", rate=TARGET_SAMPLE_RATE)
+        pieces = []
+        for frame in container.decode(audio=0):
+            for out in resampler.resample(frame):
+                pieces.append(out.to_ndarray().reshape(-1))
+        for out in resampler.resample(None):
+            pieces.append(out.to_ndarray().reshape(-1))
+    if not pieces:
+        return np.zeros(0, dtype=np.float32), TARGET_SAMPLE_RATE
+    return np.concatenate(pieces), TARGET_SAMPLE_RATE
+
+
+def decode(audio_bytes: bytes) -> Tuple[np.ndarray, int]:
+    """
+    Decode audio bytes to a float32 array and its sample rate.
+
+    Uses soundfile (WAV, FLAC, OGG/Vorbis, ...) and falls back to PyAV for
+    formats libsndfile cannot read, such as WebM/Opus, when PyAV is available.
+    A SpooledUpload is decoded straight from its file.
+    """
+    try:
+        return sf.read(readable(audio_bytes), dtype="float32")
+    except sf.LibsndfileError:
+        if av is None:
+            raise
+        return _decode_with_av(audio_bytes)
+
+
+def load_waveform(audio_bytes: bytes) -> np.ndarray:
+    """
+    Full front-end: decode → mono → 16 kHz, float32 throughout.
+
+    Args:
+        audio_bytes: Raw audio file bytes.
+
+    Returns:
+        1-D float32 waveform at TARGET_SAMPLE_RATE.
+    """
+    waveform, sample_rate = decode(audio_bytes)
+    return resample(to_mono(waveform), sample_rate)
@@ -1,13 +1,202 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import jwt
 from fastapi import Request, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 
 from .supabaseClient import supabase
 
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+
+# Supabase "JWT Secret" (Project Settings → API). When set, HS256 access tokens
+# are verified locally instead of calling the Supabase auth endpoint.
+_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET", "")
+
+# Projects using asymmetric signing keys publish them at this JWKS endpoint.
+_JWKS_URL = os.getenv(
+    "SUPABASE_JWKS_URL",
+    f"{os.getenv('SUPABASE_URL', '').rstrip('/')}/auth/v1/.well-known/jwks.json",
+)
+
+# Expected "aud" claim on Supabase access tokens.
+_JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+
+# Set AUTH_LOCAL_VERIFY=false to always validate tokens against Supabase.
+_LOCAL_VERIFY = os.getenv("AUTH_LOCAL_VERIFY", "true").strip().lower() == "true"
+
+# Validated tokens are remembered for at most this long (and never past "exp").
+_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "300"))
+_CACHE_MAX_SIZE = int(os.getenv("AUTH_CACHE_MAX_SIZE", "1024"))
+
+_ASYMMETRIC_ALGORITHMS = ["RS256", "ES256"]
+
+
+class _UnknownSigningKey(Exception):
+    """Raised when a token cannot be verified locally and must go to Supabase."""
+
+
+class TokenCache:
+    """
+    Bounded, TTL-based LRU cache of validated token → user_id mappings.
+
+    Keys are SHA-256 digests of the token so raw JWTs are never held in the
+    cache. Entries expire after AUTH_CACHE_TTL_SECONDS or at the token's own
+    "exp" claim, whichever comes first.
+    """
+
+    def __init__(self, max_size: int = _CACHE_MAX_SIZE, ttl: int = _CACHE_TTL):
+        # Maps token digest -> (user_id, expires_at wall-clock timestamp)
+        self._entries: "OrderedDict[str, tuple[str, float]]" = OrderedDict()
+        self._max_size = max_size
+        self._ttl = ttl
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[str]:
+        """Return the cached user_id for a token, or None on miss/expiry."""
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user_id, expires_at = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user_id
+
+    def put(self, token: str, user_id: str, token_exp: Optional[float] = None) -> None:
+        """Remember a validated token until the TTL or its own expiry."""
+        expires_at = time.time() + self._ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (user_id, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_token_cache = TokenCache()
+
+# JWKS keys are fetched once and refreshed hourly; unknown "kid"s trigger a refetch.
+_jwks_client = (
+    jwt.PyJWKClient(_JWKS_URL, cache_keys=True, lifespan=3600)
+    if _JWKS_URL.startswith("http")
+    else None
+)
+
+
+def _verify_locally(token: str) -> dict:
+    """
+    Verify a token's signature and expiry without contacting Supabase.
+
+    Args:
+        token: The raw access token.
+
+    Returns:
+        The decoded JWT claims.
+
+    Raises:
+        jwt.InvalidTokenError: If the token is expired, malformed, or forged.
+        _UnknownSigningKey:    If no local key can verify this token.
+    """
+    header = jwt.get_unverified_header(token)
+    algorithm = header.get("alg")
+
+    if algorithm == "HS256":
+        if not _JWT_SECRET:
+            raise _UnknownSigningKey("SUPABASE_JWT_SECRET is not configured.")
+        key = _JWT_SECRET
+    elif algorithm in _ASYMMETRIC_ALGORITHMS and _jwks_client is not None:
+        try:
+            key = _jwks_client.get_signing_key_from_jwt(token).key
+        except jwt.PyJWKClientError as exc:
+            raise _UnknownSigningKey(str(exc)) from exc
+    else:
+        raise _UnknownSigningKey(f"Unsupported signing algorithm: {algorithm}")
+
+    return jwt.decode(
+        token,
+        key,
+        algorithms=[algorithm],
+        audience=_JWT_AUDIENCE,
+        options={"require": ["exp", "sub"]},
+    )
+
+
+def _verify_remotely(token: str) -> str:
+    """Validate a token against the Supabase auth endpoint (blocking)."""
+    response = supabase.auth.get_user(token)
+    user = response.user
+
+    if not user or not user.id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    return user.id
+
+
+def _resolve_user_id(token: str) -> str:
+    """
+    Validate a token and return its user_id, populating the cache.
+
+    Local verification is tried first; the remote Supabase call is only made
+    when the token is signed with a key we do not hold locally.
+    """
+    if _LOCAL_VERIFY:
+        try:
+            claims = _verify_locally(token)
+            _token_cache.put(token, claims["sub"], claims.get("exp"))
+            return claims["sub"]
+        except _UnknownSigningKey:
+            pass
+        except jwt.InvalidTokenError as exc:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=f"Invalid or expired token: {str(exc)}",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+
+    user_id = _verify_remotely(token)
+    try:
+        token_exp = jwt.decode(token, options={"verify_signature": False}).get("exp")
+    except jwt.InvalidTokenError:
+        token_exp = None
+    _token_cache.put(token, user_id, token_exp)
+    return user_id
+
 
 async def get_current_user(request: Request) -> str:
     """
     FastAPI dependency that validates the Supabase JWT from the
     Authorization: Bearer <token> header.
 
+    Validated tokens are cached (keyed by token hash) so repeat requests skip
+    verification entirely. On a cache miss the signature and expiry are
+    checked locally when SUPABASE_JWT_SECRET or a JWKS key is available,
+    falling back to Supabase's auth endpoint in a worker thread otherwise.
+
     Usage:
         @app.post("/chat")
         async def chat(user_id: str = Depends(get_current_user)):
@@ -37,18 +226,14 @@ async def get_current_user(request: Request) -> str:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    try:
-        response = supabase.auth.get_user(token)
-        user = response.user
+    cached_user_id = _token_cache.get(token)
+    if cached_user_id is not None:
+        return cached_user_id
 
-        if not user or not user.id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid or expired token.",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-
-        return user.id
+    try:
+        # JWKS fetches and the Supabase fallback both block — keep them
+        # off the event loop.
+        return await run_in_threadpool(_resolve_user_id, token)
 
     except HTTPException:
         raise
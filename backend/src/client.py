@@ -1,15 +1,29 @@
-from typing import Union
+import asyncio
+import hashlib
+import os
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple, Union
 from dotenv import load_dotenv
 
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain.memory import ConversationBufferMemory
 
+from .memory import TokenBudgetWindow
 from .prompts import load_prompt
 from .providers.factory import get_model_provider
 from .tools import generate_image, generate_quiz, make_save_notes_tool
 
 load_dotenv()
 
+# Async callback used to push streaming events: emit(event_name, payload).
+EmitFn = Callable[[str, dict], Awaitable[None]]
+
+# Per-tool execution timeouts in seconds. A timed-out call is reported as a
+# tool error; the worker thread of a sync tool is left to finish on its own.
+_TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT_SECONDS", "30"))
+_TOOL_TIMEOUTS = {
+    "generate_image": float(os.getenv("IMAGE_TOOL_TIMEOUT_SECONDS", "120")),
+}
+
 # Loaded once at module import — not on every Agent instantiation.
 _SYSTEM_PROMPT = load_prompt("agent_system_prompt")
 
@@ -26,9 +40,11 @@ class Agent:
     """
 
     def __init__(self):
-        provider = get_model_provider()
+        # Providers pool their clients process-wide, so resolving the LLM here
+        # and per message is a cache lookup rather than a new connection.
+        self._provider = get_model_provider()
         self._base_tools = [generate_image, generate_quiz]
-        self.llm = provider.get_llm(self._base_tools)
+        self.llm = self._provider.get_llm(self._base_tools)
 
         self.memory = ConversationBufferMemory(
             memory_key="chat_history",
@@ -36,11 +52,86 @@ class Agent:
         )
         self.memory.chat_memory.add_message(SystemMessage(content=_SYSTEM_PROMPT))
 
-    def _get_llm_with_save_notes(self, jwt: str):
-        """Return an LLM instance that has save_notes bound with the user's JWT."""
-        provider = get_model_provider()
-        save_notes_tool = make_save_notes_tool(jwt)
-        return provider.get_llm(self._base_tools + [save_notes_tool])
+        # Decides how much of the history is sent per turn (MEMORY_MODE) and
+        # tracks prompt-size metrics for this session.
+        self.window = TokenBudgetWindow(summarizer_llm=self._provider.get_llm([]))
+
+        # Fingerprint of the last frontend chat_history applied to memory:
+        # (message count, hash of its last message), plus how long memory
+        # was right after that sync — see sync_history().
+        self._history_fingerprint = (0, "")
+        self._synced_memory_len = len(self.memory.chat_memory.messages)
+
+        # Strong references to in-flight stream_query turns.
+        self._stream_tasks: set = set()
+
+    @staticmethod
+    def _history_entry_hash(entry: dict) -> str:
+        return hashlib.sha256(
+            f"{entry.get('sender')}\x00{entry.get('text', '')}".encode("utf-8")
+        ).hexdigest()
+
+    @staticmethod
+    def _history_entry_to_message(entry: dict):
+        if entry.get("sender") == "user":
+            return HumanMessage(content=entry.get("text", ""))
+        if entry.get("sender") == "bot":
+            return AIMessage(content=entry.get("text", ""))
+        return None
+
+    def sync_history(self, chat_history: List[dict]) -> str:
+        """
+        Bring memory in line with chat history sent by the frontend.
+
+        Compares the incoming history against the fingerprint of the last one
+        applied, so only the cheap case analysis below runs per request:
+
+            unchanged - same length and last message: nothing to do
+            appended  - the previous history is a prefix and no turns were
+                        processed since: only the new messages are added
+            rebuilt   - anything else: memory is rebuilt from scratch
+
+        Args:
+            chat_history: List of {"sender": "user"|"bot", "text": str} dicts.
+
+        Returns:
+            Which of the three cases applied.
+        """
+        synced_len, synced_tail = self._history_fingerprint
+        new_len = len(chat_history)
+        new_tail = self._history_entry_hash(chat_history[-1]) if chat_history else ""
+        messages = self.memory.chat_memory.messages
+
+        if (new_len, new_tail) == (synced_len, synced_tail):
+            return "unchanged"
+
+        if (
+            0 < synced_len < new_len
+            and len(messages) == self._synced_memory_len
+            and self._history_entry_hash(chat_history[synced_len - 1]) == synced_tail
+        ):
+            outcome = "appended"
+            delta = chat_history[synced_len:]
+        else:
+            outcome = "rebuilt"
+            delta = chat_history
+            self.memory = ConversationBufferMemory(
+                memory_key="chat_history", return_messages=True
+            )
+            self.memory.chat_memory.add_message(SystemMessage(content=_SYSTEM_PROMPT))
+
+        for entry in delta:
+            message = self._history_entry_to_message(entry)
+            if message is not None:
+                self.memory.chat_memory.add_message(message)
+
+        self._history_fingerprint = (new_len, new_tail)
+        self._synced_memory_len = len(self.memory.chat_memory.messages)
+        return outcome
+
+    def _get_llm_with_save_notes(self, save_notes_tool):
+        """Return an LLM instance that has the user's save_notes tool bound."""
+        return self._provider.get_llm(self._base_tools + [save_notes_tool])
 
     def format_quiz_report_summary(self, quiz_report: list) -> str:
         """Format quiz results into a structured summary for the LLM."""
@@ -66,7 +157,148 @@ class Agent:
         summary += "Please provide feedback on the student's performance and suggest areas for improvement."
         return summary
 
-    async def process_query(self, user_input: Union[str, dict], user_id: str, jwt: str) -> dict:
+    @staticmethod
+    def _chunk_text(content) -> str:
+        """Extract the plain text from a (possibly multi-part) message chunk."""
+        if isinstance(content, str):
+            return content
+        return "".join(
+            part.get("text", "") if isinstance(part, dict) else str(part)
+            for part in content
+        )
+
+    async def _complete(self, llm, messages: list, emit: Optional[EmitFn]):
+        """
+        Run one LLM call, streaming text tokens through `emit` when given.
+
+        Returns the full response message either way; streamed chunks are
+        summed so tool calls are available exactly as with ainvoke().
+        """
+        if emit is None:
+            return await llm.ainvoke(messages)
+
+        response = None
+        async for chunk in llm.astream(messages):
+            response = chunk if response is None else response + chunk
+            piece = self._chunk_text(chunk.content)
+            if piece:
+                await emit("token", {"text": piece})
+        return response
+
+    async def _execute_tool_call(
+        self, tool_call: dict, save_notes_tool, user_id: str, emit: Optional[EmitFn]
+    ) -> Optional[dict]:
+        """
+        Run a single tool call with its timeout and classify the outcome.
+
+        Tools are invoked through ainvoke(), which awaits async-native tools
+        directly and runs sync ones in the default thread pool, so nothing
+        blocks the event loop.
+
+        Returns:
+            One of {"image": ...}, {"quiz": ...}, {"notes": status},
+            {"error": message}, or None for unknown / malformed calls.
+        """
+        tool_name = tool_call.get("name")
+        tool_params = tool_call.get("args", {})
+        timeout = _TOOL_TIMEOUTS.get(tool_name, _TOOL_TIMEOUT)
+
+        if tool_name == "generate_image" and "description" in tool_params:
+            try:
+                result = await asyncio.wait_for(
+                    generate_image.ainvoke({"description": tool_params["description"]}),
+                    timeout,
+                ) or ""
+                if isinstance(result, str) and result.startswith("Error"):
+                    return {"error": result}
+                if emit:
+                    await emit("image", {"image": result})
+                return {"image": result}
+            except asyncio.TimeoutError:
+                return {"error": f"Error generating image: timed out after {timeout:.0f}s"}
+            except Exception as e:
+                return {"error": f"Error generating image: {e}"}
+
+        if tool_name == "generate_quiz":
+            try:
+                json_data = await asyncio.wait_for(
+                    generate_quiz.ainvoke({"content": tool_params["content"]}),
+                    timeout,
+                )
+                if isinstance(json_data, dict) and "error" in json_data:
+                    return {"error": json_data["error"]}
+                if emit:
+                    await emit("quiz", {"quiz": json_data})
+                return {"quiz": json_data}
+            except asyncio.TimeoutError:
+                return {"error": f"Error processing quiz: timed out after {timeout:.0f}s"}
+            except Exception as e:
+                return {"error": f"Error processing quiz: {e}"}
+
+        if tool_name == "save_notes":
+            try:
+                status = await asyncio.wait_for(
+                    save_notes_tool.ainvoke({
+                        "data": tool_params["data"],
+                        "user_id": user_id,
+                    }),
+                    timeout,
+                )
+                if isinstance(status, str) and status.startswith("Error"):
+                    return {"error": status}
+                if emit:
+                    await emit("notes", {"status": status})
+                return {"notes": status}
+            except asyncio.TimeoutError:
+                return {"error": f"Error saving notes: timed out after {timeout:.0f}s"}
+            except Exception as e:
+                return {"error": f"Error saving notes: {e}"}
+
+        return None
+
+    async def stream_query(
+        self, user_input: Union[str, dict], user_id: str, jwt: str
+    ) -> AsyncIterator[Tuple[str, dict]]:
+        """
+        Streaming variant of process_query.
+
+        Yields (event, payload) pairs: "token" events as text arrives, then
+        "image" / "quiz" / "notes" / "tool_error" events as tools resolve,
+        and finally a "done" event whose payload is the same dict that
+        process_query returns.
+
+        The turn runs in its own task, so memory is updated exactly as in
+        process_query even if the consumer stops reading early.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def emit(event: str, payload: dict) -> None:
+            await queue.put((event, payload))
+
+        async def run() -> None:
+            try:
+                result = await self.process_query(user_input, user_id, jwt, emit=emit)
+            except Exception as e:
+                result = {"text": f"Error: {str(e)}", "image": "", "quiz": None}
+            await queue.put(("done", result))
+
+        task = asyncio.create_task(run())
+        self._stream_tasks.add(task)
+        task.add_done_callback(self._stream_tasks.discard)
+
+        while True:
+            event, payload = await queue.get()
+            yield event, payload
+            if event == "done":
+                break
+
+    async def process_query(
+        self,
+        user_input: Union[str, dict],
+        user_id: str,
+        jwt: str,
+        emit: Optional[EmitFn] = None,
+    ) -> dict:
         """
         Process a user query and return the agent's response.
 
@@ -75,6 +307,9 @@ class Agent:
                         'text', 'image_base64', 'quizReport'.
             user_id:    The authenticated user's UUID (from JWT, not from request body).
             jwt:        The user's Supabase access token, used to scope DB writes.
+            emit:       Optional async callback. When given, the LLM reply is
+                        streamed as "token" events and each tool result is
+                        emitted as soon as it resolves (see stream_query).
 
         Returns:
             dict with keys: 'text', 'image', 'quiz'.
@@ -93,14 +328,16 @@ class Agent:
         if quiz_report:
             try:
                 quiz_summary = self.format_quiz_report_summary(quiz_report)
-                messages = self.memory.chat_memory.messages.copy()
-                messages.append(HumanMessage(content=quiz_summary))
+                messages = self.window.build(
+                    self.memory.chat_memory.messages, HumanMessage(content=quiz_summary)
+                )
 
-                response = await self.llm.ainvoke(messages)
+                response = await self._complete(self.llm, messages, emit)
                 explanation = response.content
 
                 self.memory.chat_memory.add_user_message(quiz_summary)
                 self.memory.chat_memory.add_ai_message(explanation)
+                self.window.maybe_summarize(self.memory.chat_memory.messages)
 
                 return {"text": explanation, "image": "", "quiz": None}
 
@@ -115,9 +352,10 @@ class Agent:
             }
 
         try:
-            llm = self._get_llm_with_save_notes(jwt)
-
-            messages = self.memory.chat_memory.messages.copy()
+            # The same tool instance is bound to the LLM and executed below;
+            # its Supabase client is only created if save_notes is called.
+            save_notes_tool = make_save_notes_tool(jwt)
+            llm = self._get_llm_with_save_notes(save_notes_tool)
 
             if image_b64:
                 content = [
@@ -127,9 +365,11 @@ class Agent:
             else:
                 content = text
 
-            messages.append(HumanMessage(content=content))
+            messages = self.window.build(
+                self.memory.chat_memory.messages, HumanMessage(content=content)
+            )
 
-            response = await llm.ainvoke(messages)
+            response = await self._complete(llm, messages, emit)
             explanation = response.content
 
             generated_image = ""
@@ -137,47 +377,31 @@ class Agent:
             tool_error = None
 
             if hasattr(response, "tool_calls") and response.tool_calls:
-                save_notes_tool = make_save_notes_tool(jwt)
-
-                for tool_call in response.tool_calls:
-                    tool_name = tool_call.get("name")
-                    tool_params = tool_call.get("args", {})
-
-                    if tool_name == "generate_image" and "description" in tool_params:
-                        try:
-                            result = generate_image.invoke({"description": tool_params["description"]}) or ""
-                            if isinstance(result, str) and result.startswith("Error"):
-                                tool_error = result
-                            else:
-                                generated_image = result
-                        except Exception as e:
-                            tool_error = f"Error generating image: {e}"
-
-                    elif tool_name == "generate_quiz":
-                        try:
-                            json_data = generate_quiz.invoke({"content": tool_params["content"]})
-                            if isinstance(json_data, dict) and "error" in json_data:
-                                tool_error = json_data["error"]
-                            else:
-                                quiz_data = json_data
-                        except Exception as e:
-                            tool_error = f"Error processing quiz: {e}"
-
-                    elif tool_name == "save_notes":
-                        try:
-                            status = save_notes_tool.invoke({
-                                "data": tool_params["data"],
-                                "user_id": user_id,
-                            })
-                            if isinstance(status, str) and status.startswith("Error"):
-                                tool_error = status
-                            else:
-                                self.memory.chat_memory.add_user_message(status)
-                        except Exception as e:
-                            tool_error = f"Error saving notes: {e}"
+                # Independent tool calls run concurrently; results are folded
+                # back in call order so the outcome matches sequential runs.
+                results = await asyncio.gather(*(
+                    self._execute_tool_call(tool_call, save_notes_tool, user_id, emit)
+                    for tool_call in response.tool_calls
+                ))
+
+                for result in results:
+                    if result is None:
+                        continue
+                    if "error" in result:
+                        tool_error = result["error"]
+                    elif "image" in result:
+                        generated_image = result["image"]
+                    elif "quiz" in result:
+                        quiz_data = result["quiz"]
+                    elif "notes" in result:
+                        self.memory.chat_memory.add_user_message(result["notes"])
+
+            if tool_error and emit:
+                await emit("tool_error", {"error": tool_error})
 
             self.memory.chat_memory.add_user_message(text)
             self.memory.chat_memory.add_ai_message(explanation)
+            self.window.maybe_summarize(self.memory.chat_memory.messages)
 
             if tool_error and not (generated_image or quiz_data):
                 return {
@@ -0,0 +1,214 @@
+import asyncio
+import os
+from typing import Any, List, Optional
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from .prompts import load_prompt
+
+# "buffer"  - send the full conversation on every turn (previous behaviour)
+# "summary" - keep recent turns verbatim within MEMORY_TOKEN_BUDGET and fold
+#             older turns into a rolling summary
+MEMORY_MODE = os.getenv("MEMORY_MODE", "buffer").strip().lower()
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "6000"))
+
+_SUMMARY_PROMPT = load_prompt("memory_summary_prompt")
+
+# Rough token accounting: ~4 characters per token for text, and Gemini's
+# fixed per-image cost. Precise enough for budgeting without an API call.
+_CHARS_PER_TOKEN = 4
+_IMAGE_TOKENS = 258
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(message: BaseMessage) -> int:
+    """Approximate the prompt tokens a single message contributes."""
+    content = message.content
+    if isinstance(content, str):
+        return len(content) // _CHARS_PER_TOKEN + _MESSAGE_OVERHEAD_TOKENS
+
+    tokens = _MESSAGE_OVERHEAD_TOKENS
+    for part in content:
+        if isinstance(part, dict) and part.get("type") == "image_url":
+            tokens += _IMAGE_TOKENS
+        elif isinstance(part, dict):
+            tokens += len(part.get("text", "")) // _CHARS_PER_TOKEN
+        else:
+            tokens += len(str(part)) // _CHARS_PER_TOKEN
+    return tokens
+
+
+def empty_stats(mode: str = MEMORY_MODE) -> dict:
+    """Prompt-size stats of a session that has had no turns yet."""
+    return {
+        "mode": mode,
+        "turns": 0,
+        "last_prompt_tokens": 0,
+        "max_prompt_tokens": 0,
+        "total_prompt_tokens": 0,
+        "history_tokens": 0,
+        "summarized_messages": 0,
+        "summary_tokens": 0,
+    }
+
+
+class TokenBudgetWindow:
+    """
+    Builds the message list sent to the LLM from an Agent's full history.
+
+    The full transcript stays in ConversationBufferMemory; this class only
+    decides what goes into each prompt. In "summary" mode the system prompt
+    and the most recent turns that fit in the token budget are sent verbatim,
+    and everything older is replaced by a rolling summary. Summaries are
+    produced by a background task after the response has been returned, so
+    they never add latency to the request that triggered them.
+
+    Per-session prompt size metrics are kept in `stats`.
+    """
+
+    def __init__(self, summarizer_llm: Any, mode: str = MEMORY_MODE, budget: int = MEMORY_TOKEN_BUDGET):
+        self._summarizer_llm = summarizer_llm
+        self.mode = mode
+        self.budget = budget
+
+        self._summary = ""
+        # Number of leading history messages (after the system prompt) that
+        # the summary covers, and the last of them — used to detect when the
+        # underlying history has been replaced.
+        self._summarized_upto = 1
+        self._summarized_tail: Optional[BaseMessage] = None
+        self._summary_task: Optional[asyncio.Task] = None
+
+        self.stats = empty_stats(mode)
+
+    def build(self, history: List[BaseMessage], new_message: BaseMessage) -> List[BaseMessage]:
+        """
+        Return the messages to send for this turn and record prompt metrics.
+
+        Args:
+            history:     Full conversation, starting with the system prompt.
+            new_message: The message being sent this turn.
+
+        Returns:
+            A new list; `history` is not modified.
+        """
+        if self.mode != "summary":
+            messages = history + [new_message]
+            self._record(messages, history)
+            return messages
+
+        self._check_summary_still_valid(history)
+
+        system, turns = history[0], history[1:]
+        remaining = self.budget - estimate_tokens(system) - estimate_tokens(new_message)
+        if self._summary:
+            remaining -= len(self._summary) // _CHARS_PER_TOKEN
+
+        # Walk backwards from the newest turn, keeping whatever fits.
+        start = len(turns)
+        while start > self._summarized_upto - 1:
+            cost = estimate_tokens(turns[start - 1])
+            if cost > remaining:
+                break
+            remaining -= cost
+            start -= 1
+
+        # Never open the window on an AI reply whose question was cut off.
+        while start < len(turns) and not isinstance(turns[start], HumanMessage):
+            start += 1
+
+        if self._summary:
+            system = SystemMessage(
+                content=f"{system.content}\n\n---\n\n# Summary of the earlier conversation\n\n{self._summary}"
+            )
+
+        messages = [system] + turns[start:] + [new_message]
+        self._record(messages, history)
+        return messages
+
+    def maybe_summarize(self, history: List[BaseMessage]) -> None:
+        """
+        Fold turns that no longer fit in the budget into the summary.
+
+        Runs as a background task; at most one summarisation is in flight
+        per session. Call after the turn has been appended to history.
+        """
+        if self.mode != "summary":
+            return
+        if self._summary_task is not None and not self._summary_task.done():
+            return
+
+        self._check_summary_still_valid(history)
+
+        # Keep roughly half the budget verbatim so a summary is not needed
+        # on every turn once the conversation is long.
+        remaining = self.budget // 2
+        cut = len(history)
+        while cut > self._summarized_upto:
+            cost = estimate_tokens(history[cut - 1])
+            if cost > remaining:
+                break
+            remaining -= cost
+            cut -= 1
+        while cut < len(history) and not isinstance(history[cut], HumanMessage):
+            cut += 1
+
+        if cut <= self._summarized_upto:
+            return
+
+        to_fold = history[self._summarized_upto:cut]
+        self._summary_task = asyncio.create_task(
+            self._summarize(to_fold, cut, history[cut - 1])
+        )
+
+    async def _summarize(self, to_fold: List[BaseMessage], cut: int, tail: BaseMessage) -> None:
+        transcript = "\n\n".join(
+            f"{'Student' if isinstance(m, HumanMessage) else 'Assistant'}: {self._text_of(m)}"
+            for m in to_fold
+        )
+        try:
+            response = await self._summarizer_llm.ainvoke([
+                SystemMessage(content=_SUMMARY_PROMPT),
+                HumanMessage(content=f"Existing summary:\n{self._summary or '(none)'}\n\nNew turns:\n{transcript}"),
+            ])
+        except Exception as e:
+            print(f"[TokenBudgetWindow] Summarisation failed: {e}")
+            return
+
+        self._summary = str(response.content).strip()
+        self._summarized_upto = cut
+        self._summarized_tail = tail
+        self.stats["summarized_messages"] = cut - 1
+        self.stats["summary_tokens"] = len(self._summary) // _CHARS_PER_TOKEN
+
+    def _check_summary_still_valid(self, history: List[BaseMessage]) -> None:
+        """Drop the summary if the history it was built from has been replaced."""
+        if self._summarized_tail is None:
+            return
+        upto = self._summarized_upto
+        if len(history) < upto or history[upto - 1] is not self._summarized_tail:
+            self.reset()
+
+    def reset(self) -> None:
+        """Forget the rolling summary (e.g. after the history is rebuilt)."""
+        self._summary = ""
+        self._summarized_upto = 1
+        self._summarized_tail = None
+        self.stats["summarized_messages"] = 0
+        self.stats["summary_tokens"] = 0
+
+    def _record(self, messages: List[BaseMessage], history: List[BaseMessage]) -> None:
+        prompt_tokens = sum(estimate_tokens(m) for m in messages)
+        self.stats["turns"] += 1
+        self.stats["last_prompt_tokens"] = prompt_tokens
+        self.stats["max_prompt_tokens"] = max(self.stats["max_prompt_tokens"], prompt_tokens)
+        self.stats["total_prompt_tokens"] += prompt_tokens
+        self.stats["history_tokens"] = sum(estimate_tokens(m) for m in history)
+
+    @staticmethod
+    def _text_of(message: BaseMessage) -> str:
+        if isinstance(message.content, str):
+            return message.content
+        return " ".join(
+            part.get("text", "") for part in message.content if isinstance(part, dict)
+        )
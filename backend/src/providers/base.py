@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, Optional
 
 
 class ModelProvider(ABC):
@@ -16,6 +16,9 @@ class ModelProvider(ABC):
         """
         Return a LangChain-compatible chat model instance with tools bound.
 
+        Called on every chat turn — implementations should reuse the
+        underlying client rather than constructing a new one per call.
+
         Args:
             tools: List of LangChain tool callables to bind to the model.
 
@@ -44,6 +47,16 @@ class EmbeddingProvider(ABC):
         """
         ...
 
+    def get_tokenizer(self) -> Optional[Any]:
+        """
+        Return a HuggingFace fast tokenizer matching the embedding model.
+
+        Used to size chunks in the model's own tokens. The default returns
+        None, for hosted models whose tokenizer is not available locally;
+        chunk sizes are then approximated from word and punctuation counts.
+        """
+        return None
+
 
 class SpeechToTextProvider(ABC):
     """
@@ -74,6 +87,10 @@ class SpeechToTextProvider(ABC):
         """
         Transcribe raw audio bytes to a text string.
 
+        Called concurrently from the STT_WORKERS transcription threads, so
+        implementations must serialise access to any model state that is
+        not thread-safe.
+
         Args:
             audio_bytes: Raw audio file bytes (any format supported by soundfile).
 
@@ -81,3 +98,27 @@ class SpeechToTextProvider(ABC):
             Transcribed text string.
         """
         ...
+
+    def get_status(self) -> dict:
+        """
+        Return provider diagnostics for the /ready endpoint (e.g. load time).
+
+        The default reports nothing; providers may override it.
+        """
+        return {}
+
+    def transcribe_long_audio_bytes(self, audio_bytes: bytes) -> str:
+        """
+        Transcribe a recording of arbitrary length.
+
+        Providers whose model has a fixed context window (e.g. Whisper's 30 s)
+        should override this to decode and transcribe the audio in pieces.
+        The default delegates to transcribe_audio_bytes.
+
+        Args:
+            audio_bytes: Raw audio file bytes (any format supported by soundfile).
+
+        Returns:
+            Transcribed text string.
+        """
+        return self.transcribe_audio_bytes(audio_bytes)
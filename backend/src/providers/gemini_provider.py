@@ -1,15 +1,43 @@
+import json
 import os
-from typing import Any
+import threading
+from typing import Any, Dict, Tuple
 
 from langchain_google_genai import ChatGoogleGenerativeAI
 
 from .base import ModelProvider
 
+# Process-wide pools shared by every GeminiProvider instance.
+#   _chat_models: (model, temperature)                 -> ChatGoogleGenerativeAI
+#   _bound_llms:  (model, temperature, tool signature) -> model.bind_tools(...)
+# Each ChatGoogleGenerativeAI owns its own HTTP/gRPC client, so reusing it
+# avoids re-creating connections on every message.
+_chat_models: Dict[Tuple[str, float], ChatGoogleGenerativeAI] = {}
+_bound_llms: Dict[Tuple[str, float, Tuple], Any] = {}
+_pool_lock = threading.Lock()
+
+
+def _tool_signature(tools: list) -> Tuple:
+    """
+    Hashable description of the tool schemas the model is told about.
+
+    Per-user tool instances (e.g. save_notes bound to a JWT) expose the same
+    name and argument schema, so they share a single bound runnable — the
+    model only ever sees the schema, never the closure.
+    """
+    return tuple(
+        (tool.name, tool.description, json.dumps(tool.args, sort_keys=True))
+        for tool in tools
+    )
+
 
 class GeminiProvider(ModelProvider):
     """
     LLM provider backed by Google Gemini via LangChain.
 
+    Chat model clients are pooled per (model, temperature) and tool bindings
+    per tool signature, so repeated get_llm() calls are dictionary lookups.
+
     Configuration (read from environment):
         MODEL_NAME        - Gemini model ID (default: gemini-2.0-flash)
         MODEL_TEMPERATURE - Sampling temperature (default: 0.7)
@@ -22,9 +50,29 @@ class GeminiProvider(ModelProvider):
     def get_llm(self, tools: list) -> Any:
         """
         Return a Gemini chat model with the given tools bound.
+
+        The underlying client and the bound runnable are reused across calls
+        with the same model, temperature and tool schemas.
         """
-        model = ChatGoogleGenerativeAI(
-            model=self.model_name,
-            temperature=self.temperature,
-        )
-        return model.bind_tools(tools)
+        model_key = (self.model_name, self.temperature)
+        bound_key = model_key + (_tool_signature(tools),)
+
+        bound = _bound_llms.get(bound_key)
+        if bound is not None:
+            return bound
+
+        with _pool_lock:
+            bound = _bound_llms.get(bound_key)
+            if bound is None:
+                model = _chat_models.get(model_key)
+                if model is None:
+                    model = ChatGoogleGenerativeAI(
+                        model=self.model_name,
+                        temperature=self.temperature,
+                    )
+                    _chat_models[model_key] = model
+                # An empty tool list would send an empty function-declaration
+                # block, which Gemini rejects — use the plain model instead.
+                bound = model.bind_tools(tools) if tools else model
+                _bound_llms[bound_key] = bound
+            return bound
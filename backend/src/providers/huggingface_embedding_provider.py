@@ -1,5 +1,6 @@
+import json
 import os
-from typing import Any
+from typing import Any, Optional
 
 from langchain_huggingface import HuggingFaceEmbeddings
 
@@ -18,6 +19,9 @@ class HuggingFaceEmbeddingProvider(EmbeddingProvider):
         EMBEDDING_MODEL_NAME - sentence-transformers model ID
                                (default: sentence-transformers/all-MiniLM-L6-v2)
                                → 384-dim, ~22 MB, fast, good quality for MVP RAG
+        EMBEDDING_BATCH_SIZE - texts per forward pass (default: 64); matches
+                               the ingestion pipeline's batch size so each
+                               pipeline batch is a single pass
 
     Other popular free options (just change the env var — no code changes):
         all-mpnet-base-v2          768-dim, higher quality, slower
@@ -29,6 +33,7 @@ class HuggingFaceEmbeddingProvider(EmbeddingProvider):
             "EMBEDDING_MODEL_NAME",
             "sentence-transformers/all-MiniLM-L6-v2",
         )
+        self.batch_size = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
 
     def get_embeddings(self) -> Any:
         """
@@ -40,5 +45,39 @@ class HuggingFaceEmbeddingProvider(EmbeddingProvider):
         return HuggingFaceEmbeddings(
             model_name=self.model_name,
             model_kwargs={"device": "cpu"},
-            encode_kwargs={"normalize_embeddings": True},
+            encode_kwargs={"normalize_embeddings": True, "batch_size": self.batch_size},
         )
+
+    def get_tokenizer(self) -> Any:
+        """
+        Return the model's tokenizer (loaded from the same local cache).
+
+        model_max_length is lowered to the sentence-transformers
+        max_seq_length, where the model actually truncates its input; it is
+        often below the tokenizer's own limit (256 vs. 512 tokens for
+        all-MiniLM-L6-v2).
+        """
+        from transformers import AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(self.model_name, use_fast=True)
+        max_seq_length = self._max_seq_length()
+        if max_seq_length:
+            tokenizer.model_max_length = min(tokenizer.model_max_length, max_seq_length)
+        return tokenizer
+
+    def _max_seq_length(self) -> Optional[int]:
+        """max_seq_length from the model's sentence_bert_config.json, if it has one."""
+        if os.path.isdir(self.model_name):
+            path = os.path.join(self.model_name, "sentence_bert_config.json")
+        else:
+            from huggingface_hub import hf_hub_download
+
+            try:
+                path = hf_hub_download(self.model_name, "sentence_bert_config.json")
+            except Exception:
+                return None
+        try:
+            with open(path) as f:
+                return json.load(f).get("max_seq_length")
+        except (OSError, ValueError):
+            return None
@@ -1,23 +1,96 @@
-import io
 import os
+import queue
+import re
 import threading
+import time
+from concurrent.futures import Future
+from typing import Iterator, List, Optional, Tuple
 
-import librosa
 import numpy as np
 import soundfile as sf
 from optimum.intel.openvino import OVModelForSpeechSeq2Seq
 from transformers import AutoProcessor
 
+from .. import audio_preprocessing
+from ..uploads import readable
 from .base import SpeechToTextProvider
 
 
+class _MicroBatcher:
+    """
+    Collects concurrent transcription requests into batches.
+
+    A single daemon thread takes the first queued waveform, waits up to
+    max_wait_s for more (stopping early at max_batch_size), runs them through
+    `run_batch` together, and resolves each caller's Future with its result.
+    """
+
+    def __init__(self, run_batch, max_batch_size: int, max_wait_s: float):
+        self._run_batch = run_batch
+        self._max_batch_size = max_batch_size
+        self._max_wait_s = max_wait_s
+        self._queue: "queue.Queue[Tuple[np.ndarray, Future]]" = queue.Queue()
+        thread = threading.Thread(target=self._loop, daemon=True)
+        thread.start()
+
+    def submit(self, waveform: np.ndarray) -> Future:
+        future: Future = Future()
+        self._queue.put((waveform, future))
+        return future
+
+    def _loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self._max_wait_s
+            while len(batch) < self._max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            waveforms = [waveform for waveform, _ in batch]
+            try:
+                results = self._run_batch(waveforms)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), text in zip(batch, results):
+                future.set_result(text)
+
+
 class WhisperSTTProvider(SpeechToTextProvider):
     """
     Speech-to-text provider backed by an OpenVINO-optimised Whisper model.
 
     Configuration (read from environment):
-        STT_MODEL_ID - HuggingFace model ID for the Whisper OpenVINO variant
-                       (default: OpenVINO/whisper-tiny-fp16-ov)
+        STT_MODEL_ID          - HuggingFace model ID for the Whisper OpenVINO variant
+                                (default: OpenVINO/whisper-tiny-fp16-ov)
+        STT_MODEL_VARIANT     - fp32 / fp16 / int8 / int4: swaps the precision
+                                suffix of STT_MODEL_ID (default: unset)
+        STT_OV_CACHE_DIR      - Persistent OpenVINO compiled-model cache
+                                (default: ~/.cache/intellilearn/openvino; empty disables)
+        STT_INFERENCE_PRECISION / STT_PERFORMANCE_HINT
+                              - OpenVINO INFERENCE_PRECISION_HINT (e.g. f16, f32)
+                                and PERFORMANCE_HINT (LATENCY, THROUGHPUT)
+        STT_WARMUP_SECONDS    - Length of the silent clip transcribed at startup
+                                (default: 1; 0 disables warm-up)
+        STT_BATCH_MAX_SIZE    - Max requests merged into one generate() call
+                                (default: 1, i.e. no batching)
+        STT_BATCH_MAX_WAIT_MS - How long the first request in a batch waits
+                                for others to arrive (default: 20)
+        STT_LONG_WINDOW_SECONDS / STT_LONG_OVERLAP_SECONDS
+                              - Window length and overlap used by
+                                transcribe_long_audio_bytes (default: 30 / 3)
+        STT_LONG_VAD          - Trim silence from long-audio windows (default: true)
+        STT_LONG_VAD_THRESHOLD- RMS level treated as speech (default: 0.01)
+
+    With batching enabled, concurrent callers block on a shared scheduler
+    thread, so STT_WORKERS should be at least STT_BATCH_MAX_SIZE for batches
+    to actually fill.
 
     The model is heavy to load, so it is always loaded asynchronously via
     load_model_async(). Call is_ready() to check whether transcription can
@@ -34,10 +107,47 @@ class WhisperSTTProvider(SpeechToTextProvider):
     ]
 
     def __init__(self):
-        self.model_id = os.getenv("STT_MODEL_ID", "OpenVINO/whisper-tiny-fp16-ov")
+        self.model_id = self._resolve_model_id(
+            os.getenv("STT_MODEL_ID", "OpenVINO/whisper-tiny-fp16-ov"),
+            os.getenv("STT_MODEL_VARIANT", "").strip().lower(),
+        )
+        self.cache_dir = os.path.expanduser(
+            os.getenv("STT_OV_CACHE_DIR", "~/.cache/intellilearn/openvino")
+        )
+        self.inference_precision = os.getenv("STT_INFERENCE_PRECISION", "").strip().lower()
+        self.performance_hint = os.getenv("STT_PERFORMANCE_HINT", "").strip().upper()
+        self.warmup_seconds = float(os.getenv("STT_WARMUP_SECONDS", "1"))
+        self.batch_max_size = int(os.getenv("STT_BATCH_MAX_SIZE", "1"))
+        self.batch_max_wait_ms = float(os.getenv("STT_BATCH_MAX_WAIT_MS", "20"))
+        self.long_window_s = float(os.getenv("STT_LONG_WINDOW_SECONDS", "30"))
+        self.long_overlap_s = float(os.getenv("STT_LONG_OVERLAP_SECONDS", "3"))
+        self.long_vad = os.getenv("STT_LONG_VAD", "true").strip().lower() == "true"
+        self.long_vad_threshold = float(os.getenv("STT_LONG_VAD_THRESHOLD", "0.01"))
         self._model = None
         self._processor = None
+        self._batcher: Optional[_MicroBatcher] = None
+        self._inference_lock = threading.Lock()
         self._ready = False
+        self._stats = {
+            "model_id": self.model_id,
+            "load_seconds": None,
+            "warmup_seconds": None,
+            "first_inference_seconds": None,
+        }
+
+    @staticmethod
+    def _resolve_model_id(model_id: str, variant: str) -> str:
+        """
+        Swap the precision suffix of an OpenVINO hub ID, e.g.
+        OpenVINO/whisper-tiny-fp16-ov + "int8" → OpenVINO/whisper-tiny-int8-ov.
+        """
+        if not variant:
+            return model_id
+        match = re.match(r"^(.*)-(fp32|fp16|int8|int4)-ov$", model_id)
+        if not match:
+            print(f"[WhisperSTTProvider] STT_MODEL_VARIANT ignored: '{model_id}' has no precision suffix.")
+            return model_id
+        return f"{match.group(1)}-{variant}-ov"
 
     # ------------------------------------------------------------------
     # SpeechToTextProvider interface
@@ -74,46 +184,221 @@ class WhisperSTTProvider(SpeechToTextProvider):
                 "Call load_model_async() at startup and check is_ready() first."
             )
         try:
-            waveform, sample_rate = sf.read(io.BytesIO(audio_bytes))
+            waveform = self._load_waveform(audio_bytes)
+            if self._batcher is not None:
+                return self._batcher.submit(waveform).result()
+            return self._transcribe_batch([waveform])[0]
+
+        except Exception as e:
+            print(f"[WhisperSTTProvider] Error transcribing audio: {e}")
+            raise
+
+    # ------------------------------------------------------------------
+    # Internal helpers
+    # ------------------------------------------------------------------
 
-            # Convert stereo / multi-channel to mono
-            if len(waveform.shape) > 1:
-                waveform = np.mean(waveform, axis=1)
+    def _load_waveform(self, audio_bytes: bytes) -> np.ndarray:
+        """Decode audio bytes to a 16 kHz mono float32 waveform."""
+        return audio_preprocessing.load_waveform(audio_bytes)
+
+    def _iter_windows(self, audio_bytes: bytes) -> Iterator[np.ndarray]:
+        """
+        Decode audio incrementally into overlapping 16 kHz mono windows.
+
+        Only one window's worth of source frames is held in memory at a time.
+        Windows that are entirely silent are skipped, and leading/trailing
+        silence is trimmed when STT_LONG_VAD is enabled.
+        """
+        with sf.SoundFile(readable(audio_bytes)) as f:
+            sample_rate = f.samplerate
+            blocksize = int(self.long_window_s * sample_rate)
+            overlap = int(self.long_overlap_s * sample_rate)
 
-            # Resample to 16 kHz (Whisper requirement)
-            if sample_rate != 16000:
-                waveform = librosa.resample(
-                    waveform, orig_sr=sample_rate, target_sr=16000
+            for block in f.blocks(blocksize=blocksize, overlap=overlap, dtype="float32"):
+                block = audio_preprocessing.resample(
+                    audio_preprocessing.to_mono(block), sample_rate
                 )
+                if self.long_vad:
+                    block = self._trim_silence(block)
+                if block.size:
+                    yield block
+
+    def _trim_silence(self, waveform: np.ndarray) -> np.ndarray:
+        """Energy-based VAD: drop leading/trailing 30 ms frames below the threshold."""
+        frame = 480  # 30 ms at 16 kHz
+        n_frames = len(waveform) // frame
+        if n_frames == 0:
+            return waveform
+        frames = waveform[: n_frames * frame].reshape(n_frames, frame)
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        voiced = np.flatnonzero(rms >= self.long_vad_threshold)
+        if voiced.size == 0:
+            return waveform[:0]
+        return waveform[voiced[0] * frame: (voiced[-1] + 1) * frame]
+
+    @staticmethod
+    def _stitch(previous: List[str], current: List[str], max_overlap: int = 24) -> List[str]:
+        """
+        Append `current` to `previous`, dropping words repeated by the window overlap.
+
+        Finds the longest run of words (compared case- and punctuation-
+        insensitively) that ends `previous` and starts `current`.
+        """
+        def norm(word: str) -> str:
+            return word.lower().strip(".,!?;:\"'")
+
+        limit = min(max_overlap, len(previous), len(current))
+        for k in range(limit, 0, -1):
+            if [norm(w) for w in previous[-k:]] == [norm(w) for w in current[:k]]:
+                return previous + current[k:]
+        return previous + current
+
+    def transcribe_long_audio_bytes(self, audio_bytes: bytes) -> str:
+        """
+        Transcribe a recording longer than Whisper's 30 s context.
 
-            inputs = self._processor(
-                waveform, sampling_rate=16000, return_tensors="pt"
+        Audio is decoded in overlapping windows (STT_LONG_WINDOW_SECONDS /
+        STT_LONG_OVERLAP_SECONDS) on a producer thread while earlier windows
+        are transcribed, in batches of up to STT_BATCH_MAX_SIZE windows. The
+        per-window texts are stitched, removing the words duplicated by the
+        overlap.
+
+        Args:
+            audio_bytes: Raw audio file bytes.
+
+        Returns:
+            Clean transcription string for the whole recording.
+
+        Raises:
+            RuntimeError: If called before the model has finished loading.
+        """
+        if not self._ready:
+            raise RuntimeError(
+                "Whisper model is not yet loaded. "
+                "Call load_model_async() at startup and check is_ready() first."
             )
+
+        windows: "queue.Queue[Optional[np.ndarray]]" = queue.Queue(maxsize=2 * self.batch_max_size)
+        decode_error: List[BaseException] = []
+        stop = threading.Event()
+
+        def put(item: Optional[np.ndarray]) -> bool:
+            # Bounded put that gives up once the consumer has stopped.
+            while not stop.is_set():
+                try:
+                    windows.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce() -> None:
+            try:
+                for window in self._iter_windows(audio_bytes):
+                    if not put(window):
+                        return
+            except Exception as e:
+                decode_error.append(e)
+            put(None)
+
+        threading.Thread(target=produce, daemon=True).start()
+
+        words: List[str] = []
+        done = False
+        try:
+            while not done:
+                batch = []
+                while len(batch) < self.batch_max_size:
+                    window = windows.get()
+                    if window is None:
+                        done = True
+                        break
+                    batch.append(window)
+                if batch:
+                    for text in self._transcribe_batch(batch):
+                        words = self._stitch(words, text.split())
+        finally:
+            stop.set()
+
+        if decode_error:
+            print(f"[WhisperSTTProvider] Error decoding long audio: {decode_error[0]}")
+            raise decode_error[0]
+
+        return " ".join(words)
+
+    def _transcribe_batch(self, waveforms: List[np.ndarray]) -> List[str]:
+        """
+        Run Whisper on one or more waveforms in a single generate() call.
+
+        The processor pads every waveform's log-mel features to Whisper's
+        fixed 30 s window, so any number of inputs stack into one batch.
+        """
+        inputs = self._processor(
+            waveforms, sampling_rate=16000, return_tensors="pt"
+        )
+        # The compiled OpenVINO model shares one infer request, so calls
+        # from concurrent STT workers must not overlap.
+        with self._inference_lock:
+            start = time.perf_counter()
             outputs = self._model.generate(inputs.input_features)
-            transcription = self._processor.batch_decode(
-                outputs, skip_special_tokens=True
-            )[0].strip()
+            if self._stats["first_inference_seconds"] is None:
+                self._stats["first_inference_seconds"] = round(time.perf_counter() - start, 3)
+        decoded = self._processor.batch_decode(outputs, skip_special_tokens=True)
+        return [self._clean_transcription(text) for text in decoded]
 
-            for token in self._SPECIAL_TOKENS:
-                transcription = transcription.replace(token, "")
+    def _clean_transcription(self, transcription: str) -> str:
+        """Strip special tokens and redundant whitespace from model output."""
+        transcription = transcription.strip()
+        for token in self._SPECIAL_TOKENS:
+            transcription = transcription.replace(token, "")
+        return " ".join(transcription.split())
 
-            return " ".join(transcription.split())
+    def _ov_config(self) -> dict:
+        """OpenVINO runtime properties built from the STT_* environment."""
+        config = {}
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            config["CACHE_DIR"] = self.cache_dir
+        if self.inference_precision:
+            config["INFERENCE_PRECISION_HINT"] = self.inference_precision
+        if self.performance_hint:
+            config["PERFORMANCE_HINT"] = self.performance_hint
+        return config
 
-        except Exception as e:
-            print(f"[WhisperSTTProvider] Error transcribing audio: {e}")
-            raise
+    def _warm_up(self) -> None:
+        """Run one inference on silence so the first real request is not the slow one."""
+        silence = np.zeros(int(self.warmup_seconds * 16000), dtype=np.float32)
+        start = time.perf_counter()
+        self._transcribe_batch([silence] * max(1, self.batch_max_size))
+        self._stats["warmup_seconds"] = round(time.perf_counter() - start, 3)
+        # Let the first real request record its own latency.
+        self._stats["first_inference_seconds"] = None
 
-    # ------------------------------------------------------------------
-    # Internal helpers
-    # ------------------------------------------------------------------
+    def get_status(self) -> dict:
+        return dict(self._stats)
 
     def _load_model(self) -> None:
         """Load the processor and model from HuggingFace / local cache."""
         try:
+            start = time.perf_counter()
             self._processor = AutoProcessor.from_pretrained(self.model_id)
-            self._model = OVModelForSpeechSeq2Seq.from_pretrained(self.model_id)
+            self._model = OVModelForSpeechSeq2Seq.from_pretrained(
+                self.model_id, ov_config=self._ov_config()
+            )
+            self._stats["load_seconds"] = round(time.perf_counter() - start, 3)
+            if self.warmup_seconds > 0:
+                self._warm_up()
+            if self.batch_max_size > 1:
+                self._batcher = _MicroBatcher(
+                    self._transcribe_batch,
+                    max_batch_size=self.batch_max_size,
+                    max_wait_s=self.batch_max_wait_ms / 1000,
+                )
             self._ready = True
-            print(f"[WhisperSTTProvider] Model '{self.model_id}' loaded successfully.")
+            print(
+                f"[WhisperSTTProvider] Model '{self.model_id}' loaded successfully "
+                f"(load {self._stats['load_seconds']}s, warm-up {self._stats['warmup_seconds']}s)."
+            )
         except Exception as e:
             self._ready = False
             print(f"[WhisperSTTProvider] Error loading model '{self.model_id}': {e}")
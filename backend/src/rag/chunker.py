@@ -0,0 +1,215 @@
+"""
+chunker.py — layout-aware chunking sized in embedding-model tokens.
+
+The recursive character splitter worked on the concatenated document text:
+page numbers were lost, tables and lists were cut wherever the character
+count ran out, and RAG_CHUNK_SIZE characters bore no fixed relation to the
+embedding model's input limit (all-MiniLM-L6-v2 silently truncates anything
+past 256 tokens).
+
+LayoutChunker instead works on the text blocks PyMuPDF reports for each
+page, in reading order. Whole blocks are packed into a chunk until the next
+one would exceed the token budget, so a paragraph or table block is only
+ever split when it is larger than a chunk on its own — and then at a line
+break, sentence end or word boundary, in that order of preference. Each
+page's blocks are tokenized in a single batch call and every later decision
+reuses those token offsets, so no text is tokenized twice.
+
+Every chunk records where it came from: "page" and "page_end" (1-based)
+and "offset", the character position of its first character in the page
+text returned by pdf_processor.iter_page_texts().
+
+Configuration (read from environment):
+    RAG_CHUNK_TOKENS         - tokens per chunk (default: 200; capped at the
+                               model's max_seq_length)
+    RAG_CHUNK_OVERLAP_TOKENS - tokens repeated from the end of the previous
+                               chunk (default: 32)
+"""
+
+import os
+import re
+import threading
+from typing import Any, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from langchain_core.documents import Document
+
+CHUNK_TOKENS = int(os.getenv("RAG_CHUNK_TOKENS", "200"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("RAG_CHUNK_OVERLAP_TOKENS", "32"))
+
+# Tokenizers without a real limit report a huge model_max_length.
+_UNBOUNDED_MODEL_MAX_LENGTH = 1_000_000
+# Fallback when no tokenizer is available: words and punctuation marks,
+# close to (slightly under) a WordPiece/SentencePiece token count.
+_APPROX_TOKEN = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END = ".!?;:"
+
+Span = Tuple[int, int]
+
+
+class TokenCounter:
+    """
+    Character spans of the tokens in a batch of texts.
+
+    Uses the embedding model's HuggingFace fast tokenizer when one is given,
+    otherwise an approximation. Thread-safe: transformers reconfigures the
+    underlying Rust tokenizer on calls, so concurrent ingestions take turns.
+    """
+
+    def __init__(self, tokenizer: Optional[Any] = None):
+        self.tokenizer = tokenizer
+        self._lock = threading.Lock()
+        # The embedding provider sets model_max_length to the length the
+        # model truncates at (see HuggingFaceEmbeddingProvider.get_tokenizer).
+        limit = getattr(tokenizer, "model_max_length", None)
+        # Room for the [CLS]/[SEP] (or <s>/</s>) tokens the model adds.
+        self.max_tokens: Optional[int] = (
+            limit - 2 if isinstance(limit, int) and limit < _UNBOUNDED_MODEL_MAX_LENGTH else None
+        )
+        # Identifies how chunks were sized, for ingest_cache.content_key().
+        self.kind = (
+            f"{type(tokenizer).__name__}:{getattr(tokenizer, 'name_or_path', '')}:{self.max_tokens}"
+            if tokenizer is not None
+            else "approximate"
+        )
+
+    def spans(self, texts: List[str]) -> List[List[Span]]:
+        if not texts:
+            return []
+        if self.tokenizer is None:
+            return [[match.span() for match in _APPROX_TOKEN.finditer(text)] for text in texts]
+        with self._lock:
+            encoded = self.tokenizer(
+                texts,
+                add_special_tokens=False,
+                truncation=False,
+                return_offsets_mapping=True,
+                return_attention_mask=False,
+                return_token_type_ids=False,
+                verbose=False,
+            )
+        return encoded["offset_mapping"]
+
+
+class _Segment(NamedTuple):
+    """A block, or part of one, that is never split further."""
+
+    page: int
+    offset: int
+    text: str
+    # Token spans relative to text.
+    spans: List[Span]
+
+
+def _segment(page: int, offset: int, text: str, spans: List[Span]) -> _Segment:
+    start, end = spans[0][0], spans[-1][1]
+    return _Segment(page, offset + start, text[start:end], [(a - start, b - start) for a, b in spans])
+
+
+class LayoutChunker:
+    """Packs PyMuPDF text blocks into token-budgeted chunks with page provenance."""
+
+    def __init__(
+        self,
+        counter: Optional[TokenCounter] = None,
+        chunk_tokens: int = CHUNK_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    ):
+        self.counter = counter or TokenCounter()
+        if self.counter.max_tokens is not None:
+            chunk_tokens = min(chunk_tokens, self.counter.max_tokens)
+        self.chunk_tokens = max(1, chunk_tokens)
+        self.overlap_tokens = max(0, min(overlap_tokens, self.chunk_tokens // 2))
+
+    def iter_chunks(self, pages: Iterable[Tuple[int, List[str]]], filename: str) -> Iterator[Document]:
+        """
+        Chunk a stream of (page_number, blocks) pairs as it arrives.
+
+        Chunks span page boundaries when blocks from consecutive pages fit
+        together. Memory use is bounded by one page plus one chunk.
+        """
+        current: List[_Segment] = []
+        used = 0
+        # Leading segments of `current` repeated from the previous chunk.
+        carried = 0
+
+        for number, blocks in pages:
+            offset = 0
+            for block, spans in zip(blocks, self.counter.spans(blocks)):
+                block_offset, offset = offset, offset + len(block) + 1
+                if not spans:
+                    continue
+                for segment in self._split_block(number, block_offset, block, spans):
+                    size = len(segment.spans)
+                    if used + size > self.chunk_tokens:
+                        if len(current) > carried:
+                            yield self._document(current, used, filename)
+                            current = self._overlap(current[-1])
+                            used = sum(len(s.spans) for s in current)
+                        if used + size > self.chunk_tokens:
+                            current, used = [], 0
+                        carried = len(current)
+                    current.append(segment)
+                    used += size
+
+        if len(current) > carried:
+            yield self._document(current, used, filename)
+
+    def _split_block(self, page: int, offset: int, text: str, spans: List[Span]) -> Iterator[_Segment]:
+        """The block as one segment, or cut into pieces if it exceeds a chunk."""
+        if len(spans) <= self.chunk_tokens:
+            yield _segment(page, offset, text, spans)
+            return
+        # Leave room for the overlap carried into each piece's chunk.
+        window = self.chunk_tokens - self.overlap_tokens
+        start = 0
+        while len(spans) - start > self.chunk_tokens:
+            cut = self._break_point(text, spans, start, start + window)
+            yield _segment(page, offset, text, spans[start:cut])
+            start = cut
+        yield _segment(page, offset, text, spans[start:])
+
+    @staticmethod
+    def _break_point(text: str, spans: List[Span], start: int, end: int) -> int:
+        """
+        Index of the token that should begin the next piece, in (start, end].
+
+        Searches the second half of the window for a line break, then a
+        sentence end, then any word boundary; falls back to a hard cut.
+        """
+        sentence = word = None
+        for k in range(end, start + max(1, (end - start) // 2) - 1, -1):
+            gap = text[spans[k - 1][1]:spans[k][0]]
+            if not gap:
+                continue
+            if "\n" in gap:
+                return k
+            if sentence is None and text[spans[k - 1][1] - 1] in _SENTENCE_END:
+                sentence = k
+            if word is None:
+                word = k
+        return sentence or word or end
+
+    def _overlap(self, last: _Segment) -> List[_Segment]:
+        """The tail of the previous chunk's last segment, starting on a word boundary."""
+        if self.overlap_tokens == 0:
+            return []
+        size = len(last.spans)
+        if size <= self.overlap_tokens:
+            return [last]
+        for k in range(size - self.overlap_tokens, size):
+            if last.text[last.spans[k - 1][1]:last.spans[k][0]]:
+                return [_segment(last.page, last.offset, last.text, last.spans[k:])]
+        return []
+
+    @staticmethod
+    def _document(segments: List[_Segment], tokens: int, filename: str) -> Document:
+        return Document(
+            page_content="\n".join(segment.text for segment in segments),
+            metadata={
+                "source": filename,
+                "page": segments[0].page + 1,
+                "page_end": segments[-1].page + 1,
+                "offset": segments[0].offset,
+                "tokens": tokens,
+            },
+        )
@@ -0,0 +1,166 @@
+"""
+embedding_cache.py — on-disk, chunk-level cache in front of an embedding model.
+
+Different PDFs still share many identical chunks (headers, licence pages,
+repeated lecture slides). CachedEmbeddings wraps the LangChain embeddings
+returned by the EmbeddingProvider and only sends chunks it has never seen
+to the model. Vectors are stored as float32 blobs in a single SQLite file,
+keyed by SHA-256 of (model name, whitespace-normalised chunk text), and the
+least recently used entries are evicted past EMBEDDING_CACHE_MAX_ENTRIES.
+
+Queries are passed through: they are never written to disk, and
+RAGPipeline keeps its own small in-memory LRU for repeated questions.
+
+Configuration (read from environment):
+    EMBEDDING_CACHE_PATH        - SQLite file (default:
+                                  ~/.cache/intellilearn/embeddings.sqlite3)
+    EMBEDDING_CACHE_MAX_ENTRIES - vectors kept (default: 100000, ~150 MB at
+                                  384 dimensions; 0 disables the cache)
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_CACHE_PATH = os.path.expanduser(
+    os.getenv("EMBEDDING_CACHE_PATH", "~/.cache/intellilearn/embeddings.sqlite3")
+)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+
+# Keys per "IN (...)" clause, well below SQLite's bound-parameter limit.
+_SQL_BATCH = 500
+
+
+def _model_name(embeddings: Any) -> str:
+    model = getattr(embeddings, "model_name", None) or getattr(embeddings, "model", "")
+    return f"{type(embeddings).__name__}:{model}"
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain Embeddings that serves repeated chunks from an SQLite cache.
+
+    Thread-safe: one connection is shared behind a lock, and the model is
+    called outside it, so concurrent ingestions only serialise on the
+    (fast) cache reads and writes.
+    """
+
+    def __init__(
+        self,
+        inner: Embeddings,
+        path: str = EMBEDDING_CACHE_PATH,
+        max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+    ):
+        self.inner = inner
+        self.model_name = _model_name(inner)
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._count = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _key(self, text: str) -> bytes:
+        normalised = " ".join(text.split())
+        return hashlib.sha256(f"{self.model_name}\x00{normalised}".encode("utf-8")).digest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed chunks, calling the model only for those not in the cache."""
+        if self._max_entries <= 0:
+            return self.inner.embed_documents(texts)
+
+        keys = [self._key(text) for text in texts]
+        found = self._lookup(list(set(keys)))
+
+        # Identical chunks within one batch are embedded once.
+        missing: Dict[bytes, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        if missing:
+            vectors = self.inner.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self._store(computed)
+            found.update(computed)
+
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        return [list(found[key]) for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.inner.embed_query(text)
+
+    def _lookup(self, keys: List[bytes]) -> Dict[bytes, List[float]]:
+        found: Dict[bytes, List[float]] = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), _SQL_BATCH):
+                batch = keys[start:start + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+                if rows:
+                    self._db.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE key IN ({','.join('?' * len(rows))})",
+                        [now] + [key for key, _ in rows],
+                    )
+        return found
+
+    def _store(self, vectors: Dict[bytes, List[float]]) -> None:
+        now = time.time()
+        rows = [
+            (key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for key, vector in vectors.items()
+        ]
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                before = self._db.total_changes
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+                )
+                self._count += self._db.total_changes - before
+                overflow = self._count - self._max_entries
+                if overflow > 0:
+                    self._db.execute(
+                        "DELETE FROM embeddings WHERE key IN "
+                        "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                        (overflow,),
+                    )
+                    self._count -= overflow
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def stats(self) -> dict:
+        """Lifetime hit/miss counts for this process and the number of stored vectors."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": self._count,
+            "max_entries": self._max_entries,
+        }
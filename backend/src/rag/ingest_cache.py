@@ -0,0 +1,103 @@
+"""
+ingest_cache.py — content-addressed cache of extracted chunks and their vectors.
+
+The same syllabus PDF is typically uploaded by many students, and re-uploaded
+by the same student after /reset. Extraction, chunking and embedding depend
+only on the file's bytes and the chunking/embedding configuration, so their
+output is cached under a SHA-256 of exactly those inputs and reused.
+
+Per-user isolation is unaffected: the cache is never queried for retrieval.
+A hit only copies the cached chunks and vectors into the uploading user's
+own collection, which /reset and session expiry delete as before. A hit also
+requires presenting the identical file, so nothing is learned from it that
+the uploader did not already have.
+
+Configuration (read from environment):
+    PDF_CACHE_MAX_ENTRIES - documents kept, least recently used evicted
+                            first (default: 64; 0 disables the cache)
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, List, NamedTuple, Optional
+
+import numpy as np
+
+from . import chunker
+from .chunker import TokenCounter
+
+_MAX_ENTRIES = int(os.getenv("PDF_CACHE_MAX_ENTRIES", "64"))
+
+
+class IngestedPDF(NamedTuple):
+    """Chunks of one PDF, ready to be stored for any user."""
+
+    texts: List[str]
+    # Per-chunk metadata without "source", which is set per upload.
+    metadatas: List[dict]
+    # (len(texts), dim) float32, read-only.
+    vectors: np.ndarray
+
+
+def content_key(pdf_bytes: bytes, embeddings: Any, counter: TokenCounter) -> str:
+    """
+    Cache key for a PDF: its bytes plus everything that shapes the output.
+
+    The embedding model is identified by its class and model name, so
+    switching EMBEDDING_PROVIDER or EMBEDDING_MODEL_NAME never returns
+    vectors from another model. The token counter is included too: chunks
+    sized by the word-count fallback (when the tokenizer failed to load)
+    are not reused once the real tokenizer is available.
+    """
+    model = getattr(embeddings, "model_name", None) or getattr(embeddings, "model", "")
+    digest = hashlib.sha256(pdf_bytes)
+    digest.update(
+        f"\x00{chunker.CHUNK_TOKENS}\x00{chunker.CHUNK_OVERLAP_TOKENS}"
+        f"\x00{type(embeddings).__name__}\x00{model}\x00{counter.kind}".encode("utf-8")
+    )
+    return digest.hexdigest()
+
+
+class IngestCache:
+    """Bounded LRU of content_key → IngestedPDF. Thread-safe."""
+
+    def __init__(self, max_entries: int = _MAX_ENTRIES):
+        self._entries: "OrderedDict[str, IngestedPDF]" = OrderedDict()
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[IngestedPDF]:
+        """Return the cached document, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, texts: List[str], metadatas: List[dict], vectors: List[List[float]]) -> IngestedPDF:
+        """Store a freshly processed document and return the cached form."""
+        array = np.asarray(vectors, dtype=np.float32)
+        array.setflags(write=False)
+        entry = IngestedPDF(
+            texts=texts,
+            metadatas=[{k: v for k, v in m.items() if k != "source"} for m in metadatas],
+            vectors=array,
+        )
+        if self._max_entries <= 0:
+            return entry
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def __len__(self) -> int:
+        return len(self._entries)
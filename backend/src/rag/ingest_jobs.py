@@ -0,0 +1,258 @@
+"""
+ingest_jobs.py — background PDF ingestion with per-user fair scheduling.
+
+/upload-pdf validates the upload, reserves one of the user's MAX_PDF_COUNT
+slots and returns a job id straight away; the extract → embed → store work
+runs here, on a fixed number of worker tasks, and clients poll
+/upload-pdf/jobs/{job_id} (or follow /upload-pdf/stream) for progress.
+
+Waiting jobs are kept in one queue per user and served round-robin, so one
+user uploading several large PDFs cannot starve everyone else.
+
+Configuration (read from environment):
+    INGEST_WORKERS          - PDFs ingested concurrently (default: 2)
+    INGEST_MAX_QUEUED_JOBS  - waiting jobs allowed before new uploads are
+                              rejected with 503 (default: 32)
+    INGEST_JOB_TTL_SECONDS  - how long finished jobs stay pollable
+                              (default: 3600)
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from ..uploads import close_upload
+from .pdf_processor import PDFValidationError
+from .rag_pipeline import UploadDiscarded, rag_pipeline
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_MAX_QUEUED_JOBS = int(os.getenv("INGEST_MAX_QUEUED_JOBS", "32"))
+INGEST_JOB_TTL_SECONDS = int(os.getenv("INGEST_JOB_TTL_SECONDS", "3600"))
+
+
+class IngestQueueFull(RuntimeError):
+    """Raised when INGEST_MAX_QUEUED_JOBS jobs are already waiting."""
+
+
+class IngestJob:
+    """One uploaded PDF and its ingestion state."""
+
+    def __init__(self, user_id: str, filename: str, pdf_bytes: bytes, reservation: int):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.filename = filename
+        # Released once the job has run, so finished jobs hold no file data.
+        self.pdf_bytes: Optional[bytes] = pdf_bytes
+        self.reservation = reservation
+        self.status = "queued"  # queued | running | done | failed
+        self.progress: dict = {}
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.status_code: Optional[int] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._watchers: List[asyncio.Queue] = []
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "status_code": self.status_code,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+    def _notify(self, event: str, payload: dict) -> None:
+        for watcher in self._watchers:
+            watcher.put_nowait((event, payload))
+
+
+class IngestJobQueue:
+    """
+    Bounded pool of asyncio workers draining per-user job queues round-robin.
+
+    All state is touched only from the event loop; ingestion progress,
+    reported from pipeline threads, is marshalled back onto it.
+    """
+
+    def __init__(self, workers: int = INGEST_WORKERS, max_queued: int = INGEST_MAX_QUEUED_JOBS):
+        self._workers = workers
+        self._max_queued = max_queued
+        self._jobs: Dict[str, IngestJob] = {}
+        # Waiting jobs per user, and the order in which users are served.
+        self._waiting: Dict[str, Deque[IngestJob]] = {}
+        self._turns: Deque[str] = deque()
+        self._queued = 0
+        self._wakeup: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        """Start the worker tasks. Call once from the application lifespan."""
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._worker(), name=f"ingest-{n}")
+                for n in range(self._workers)
+            ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, user_id: str, pdf_bytes: bytes, filename: str) -> IngestJob:
+        """
+        Validate an upload and queue it for ingestion.
+
+        Raises:
+            PDFValidationError: On size, count, or format violations.
+            IngestQueueFull:    If INGEST_MAX_QUEUED_JOBS jobs are waiting.
+        """
+        self._prune()
+        if self._queued >= self._max_queued:
+            raise IngestQueueFull(f"Ingestion queue is full ({self._max_queued} waiting).")
+
+        reservation = rag_pipeline.reserve_upload(user_id, pdf_bytes, filename)
+        job = IngestJob(user_id, filename, pdf_bytes, reservation)
+        self._jobs[job.id] = job
+
+        if user_id not in self._waiting:
+            self._waiting[user_id] = deque()
+            self._turns.append(user_id)
+        self._waiting[user_id].append(job)
+        self._queued += 1
+        self._wakeup.put_nowait(None)
+        return job
+
+    def get(self, user_id: str, job_id: str) -> Optional[IngestJob]:
+        """Return the user's job, or None if it is unknown, expired or someone else's."""
+        job = self._jobs.get(job_id)
+        if job is None or job.user_id != user_id:
+            return None
+        return job
+
+    def list_jobs(self, user_id: str) -> List[IngestJob]:
+        self._prune()
+        return [job for job in self._jobs.values() if job.user_id == user_id]
+
+    def queue_position(self, job: IngestJob) -> Optional[int]:
+        """How many jobs will start before this one (None unless queued)."""
+        if job.status != "queued":
+            return None
+        # Round-robin: each user ahead in the rotation gets one turn per round.
+        user_jobs = self._waiting.get(job.user_id, deque())
+        rounds = list(user_jobs).index(job)
+        turn = list(self._turns).index(job.user_id)
+        ahead = 0
+        for position, user_id in enumerate(self._turns):
+            waiting = len(self._waiting[user_id])
+            ahead += min(waiting, rounds + (1 if position < turn else 0))
+        return ahead
+
+    async def watch(self, job: IngestJob) -> AsyncIterator[Tuple[str, dict]]:
+        """
+        Yield ("progress", counters) events until the job finishes, then a
+        final ("done", result) or ("error", {status_code, detail}) event.
+        """
+        watcher: asyncio.Queue = asyncio.Queue()
+        job._watchers.append(watcher)
+        try:
+            if not job.finished:
+                while True:
+                    event, payload = await watcher.get()
+                    if event != "progress":
+                        break
+                    yield event, payload
+            if job.status == "done":
+                yield "done", job.result
+            else:
+                yield "error", {"status_code": job.status_code, "detail": job.error}
+        finally:
+            job._watchers.remove(watcher)
+
+    def _next_job(self) -> Optional[IngestJob]:
+        """Take the next user's oldest job and move that user to the back of the line."""
+        if not self._turns:
+            return None
+        user_id = self._turns.popleft()
+        jobs = self._waiting[user_id]
+        job = jobs.popleft()
+        if jobs:
+            self._turns.append(user_id)
+        else:
+            del self._waiting[user_id]
+        self._queued -= 1
+        return job
+
+    async def _worker(self) -> None:
+        while True:
+            await self._wakeup.get()
+            job = self._next_job()
+            if job is not None:
+                await self._run(job)
+
+    async def _run(self, job: IngestJob) -> None:
+        loop = asyncio.get_running_loop()
+
+        def on_progress(counters: dict) -> None:
+            # Called from an ingestion pipeline thread.
+            loop.call_soon_threadsafe(self._set_progress, job, counters)
+
+        job.status = "running"
+        try:
+            job.result = await rag_pipeline.ingest_pdf(
+                user_id=job.user_id,
+                pdf_bytes=job.pdf_bytes,
+                filename=job.filename,
+                progress=on_progress,
+                reservation=job.reservation,
+            )
+            job.status = "done"
+        except PDFValidationError as e:
+            self._fail(job, 400, str(e))
+        except UploadDiscarded as e:
+            self._fail(job, 409, str(e))
+        except Exception as e:
+            print(f"[ingest_jobs] Unexpected error for user {job.user_id}: {e}")
+            self._fail(job, 500, f"Failed to process PDF: {str(e)}")
+        finally:
+            close_upload(job.pdf_bytes)
+            job.pdf_bytes = None
+            job.finished_at = time.time()
+            job._notify(job.status, {})
+
+    @staticmethod
+    def _set_progress(job: IngestJob, counters: dict) -> None:
+        job.progress = counters
+        job._notify("progress", counters)
+
+    @staticmethod
+    def _fail(job: IngestJob, status_code: int, detail: str) -> None:
+        job.status = "failed"
+        job.status_code = status_code
+        job.error = detail
+
+    def _prune(self) -> None:
+        """Forget finished jobs older than INGEST_JOB_TTL_SECONDS."""
+        cutoff = time.time() - INGEST_JOB_TTL_SECONDS
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+# Singleton instance shared across the application lifetime
+ingest_jobs = IngestJobQueue()
@@ -0,0 +1,383 @@
+"""
+numpy_index.py — in-process brute-force vector index, one matrix per user.
+
+Chunks are at most RAG_CHUNK_TOKENS tokens (capped at the embedding model's
+max_seq_length; see chunker.py), so MAX_PDF_COUNT PDFs make a user's corpus
+a few thousand vectors, small enough that exact search is a single
+matrix-vector product. Each user's embeddings are L2-normalised and kept in one contiguous
+float32 (or float16) matrix that grows by doubling; a query is one matmul
+plus an argpartition for the top-k, with no HNSW graph or SQLite behind it.
+
+Scores are converted to the same [0, 1] relevance Chroma's default L2 space
+yields for unit vectors, so RAG_SIMILARITY_THRESHOLD means the same thing
+under either backend.
+
+Selected with VECTOR_BACKEND=numpy; see vector_store.py. Without a path
+the data lives in process memory only. With one (VECTOR_STORE_MODE=
+persistent), every user's chunks are also appended to files under
+<path>/<hash of user_id>/:
+
+    meta.json     user_id, embedding dimension and dtype
+    vectors.bin   raw matrix rows, appended per batch
+    chunks.jsonl  one {"text", "metadata"} line per row
+
+A user's matrix is loaded on first access, and once the resident matrices
+and texts exceed memory_limit_bytes the least recently used users are
+dropped from memory; their files stay on disk for the next access.
+"""
+
+import hashlib
+import json
+import math
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+_INITIAL_CAPACITY = 256
+
+# float16 matrices are upcast in blocks of this many rows for the matmul,
+# since NumPy has no BLAS kernel for half precision.
+_UPCAST_BLOCK_ROWS = 4096
+
+
+class _UserIndex:
+    """Growable embedding matrix plus the chunk text/metadata for its rows."""
+
+    __slots__ = ("matrix", "count", "texts", "metadatas", "text_bytes")
+
+    def __init__(self, dim: int, dtype: np.dtype, capacity: int = _INITIAL_CAPACITY):
+        self.matrix = np.empty((max(capacity, _INITIAL_CAPACITY), dim), dtype=dtype)
+        self.count = 0
+        self.texts: List[str] = []
+        self.metadatas: List[dict] = []
+        self.text_bytes = 0
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate resident size: allocated matrix plus chunk text."""
+        return self.matrix.nbytes + self.text_bytes
+
+    def append(self, vectors: np.ndarray, texts: List[str], metadatas: List[dict]) -> None:
+        needed = self.count + len(vectors)
+        if needed > len(self.matrix):
+            capacity = len(self.matrix)
+            while capacity < needed:
+                capacity *= 2
+            grown = np.empty((capacity, self.matrix.shape[1]), dtype=self.matrix.dtype)
+            grown[:self.count] = self.matrix[:self.count]
+            self.matrix = grown
+        self.matrix[self.count:needed] = vectors
+        self.count = needed
+        self.texts.extend(texts)
+        self.metadatas.extend(metadatas)
+        self.text_bytes += sum(len(text) for text in texts)
+
+
+def _normalise(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    np.maximum(norms, 1e-12, out=norms)
+    return vectors / norms
+
+
+def _scores(matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Cosine similarity of every row of `matrix` with the unit `query`."""
+    if matrix.dtype == np.float32:
+        return matrix @ query
+    out = np.empty(len(matrix), dtype=np.float32)
+    for start in range(0, len(matrix), _UPCAST_BLOCK_ROWS):
+        block = matrix[start:start + _UPCAST_BLOCK_ROWS].astype(np.float32)
+        out[start:start + len(block)] = block @ query
+    return out
+
+
+class NumpyVectorIndex:
+    """
+    Exact top-k search over per-user embedding matrices.
+
+    Thread-safe: writers append under a lock, and readers take a snapshot of
+    the row count under the same lock, then search without holding it. Rows
+    beyond the snapshot may be written concurrently but are never read, and a
+    reallocated (or evicted) matrix leaves the snapshotted one intact.
+
+    Args:
+        dtype:              "float32" or "float16".
+        path:               Directory to persist users' chunks in; None keeps
+                            everything in memory.
+        memory_limit_bytes: With a path, resident size above which the least
+                            recently used users are unloaded (0 = no limit).
+    """
+
+    def __init__(self, dtype: str = "float32", path: Optional[str] = None, memory_limit_bytes: int = 0):
+        if dtype not in ("float32", "float16"):
+            raise ValueError(
+                f"Unsupported vector dtype: '{dtype}'. Supported values: 'float32', 'float16'."
+            )
+        self.dtype = np.dtype(dtype)
+        self.path = path
+        self.memory_limit_bytes = memory_limit_bytes
+        # Resident users, least recently used first.
+        self._users: "OrderedDict[str, _UserIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(path, exist_ok=True)
+
+    def add(
+        self,
+        user_id: str,
+        texts: List[str],
+        metadatas: List[dict],
+        embeddings: List[List[float]],
+    ) -> int:
+        """Append chunks and their embeddings to the user's matrix."""
+        if not texts:
+            return 0
+        vectors = _normalise(np.asarray(embeddings, dtype=np.float32)).astype(self.dtype, copy=False)
+
+        with self._lock:
+            index = self._resident(user_id)
+            if index is None:
+                index = _UserIndex(vectors.shape[1], self.dtype)
+                self._users[user_id] = index
+                if self.path is not None:
+                    # Discard leftovers of an incomplete earlier write.
+                    shutil.rmtree(self._user_dir(user_id), ignore_errors=True)
+                self._write_meta(user_id, vectors.shape[1])
+            elif vectors.shape[1] != index.matrix.shape[1]:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match the "
+                    f"user's existing index ({index.matrix.shape[1]})."
+                )
+            self._append_files(user_id, vectors, texts, metadatas)
+            index.append(vectors, texts, metadatas)
+            self._evict(keep=user_id)
+        return len(texts)
+
+    def has_user(self, user_id: str) -> bool:
+        """Return True if the user has an index (i.e. has uploaded chunks)."""
+        with self._lock:
+            if user_id in self._users:
+                return True
+            return self.path is not None and os.path.exists(self._file(user_id, "meta.json"))
+
+    def search(
+        self, user_id: str, query_embedding: List[float], k: int
+    ) -> Optional[List[Tuple[str, dict, float]]]:
+        """
+        Return the k best chunks as (text, metadata, relevance), best first.
+
+        Returns None if the user has no index.
+        """
+        with self._lock:
+            index = self._resident(user_id)
+            if index is None:
+                return None
+            self._evict(keep=user_id)
+            count = index.count
+            matrix = index.matrix[:count]
+            texts, metadatas = index.texts, index.metadatas
+
+        k = min(k, count)
+        if k <= 0:
+            return []
+
+        query = _normalise(np.asarray(query_embedding, dtype=np.float32))
+        similarity = _scores(matrix, query)
+        top = np.argpartition(-similarity, k - 1)[:k] if k < count else np.arange(count)
+        top = top[np.argsort(-similarity[top])]
+
+        results = []
+        for row in top:
+            # Chroma's "l2" space reports squared L2 distance, which for unit
+            # vectors is 2 - 2·cos; scored as vector_store._relevance_score does.
+            distance = 2.0 - 2.0 * float(similarity[row])
+            results.append((texts[row], metadatas[row], 1.0 - distance / math.sqrt(2)))
+        return results
+
+    def delete_where(self, user_id: str, field: str, value: Any) -> int:
+        """
+        Drop the user's rows whose metadata[field] == value; returns rows removed.
+
+        The surviving rows are copied into a fresh index, so searches already
+        running against the old matrix are unaffected.
+        """
+        with self._lock:
+            index = self._resident(user_id)
+            if index is None:
+                return 0
+            keep = [
+                row for row in range(index.count)
+                if (index.metadatas[row] or {}).get(field) != value
+            ]
+            removed = index.count - len(keep)
+            if removed:
+                rebuilt = _UserIndex(index.matrix.shape[1], self.dtype)
+                rebuilt.append(
+                    index.matrix[keep],
+                    [index.texts[row] for row in keep],
+                    [index.metadatas[row] for row in keep],
+                )
+                self._users[user_id] = rebuilt
+                self._rewrite_files(user_id, rebuilt)
+            return removed
+
+    def delete(self, user_id: str) -> None:
+        """Drop the user's index, if any, from memory and disk."""
+        with self._lock:
+            self._users.pop(user_id, None)
+            if self.path is not None:
+                shutil.rmtree(self._user_dir(user_id), ignore_errors=True)
+
+    def unload(self, user_id: str) -> None:
+        """Drop a persisted user's index from memory; it is reloaded on next access."""
+        if self.path is None:
+            return
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def list_metadatas(self) -> Dict[str, List[dict]]:
+        """
+        Chunk metadata of every index, as {user_id: [metadata, ...]}.
+
+        With a path this reads every user's chunks.jsonl, without loading
+        any vectors into memory.
+        """
+        with self._lock:
+            if self.path is None:
+                return {user_id: index.metadatas[:index.count] for user_id, index in self._users.items()}
+            result: Dict[str, List[dict]] = {}
+            for name in os.listdir(self.path):
+                meta = self._read_meta(os.path.join(self.path, name))
+                if meta is None:
+                    continue
+                index = self._users.get(meta["user_id"])
+                if index is not None:
+                    result[meta["user_id"]] = index.metadatas[:index.count]
+                else:
+                    chunks = self._read_chunks(os.path.join(self.path, name, "chunks.jsonl"))
+                    result[meta["user_id"]] = [chunk["metadata"] for chunk in chunks]
+            return result
+
+    def memory_bytes(self) -> int:
+        """Resident bytes: allocated matrices (not just rows in use) plus chunk text."""
+        with self._lock:
+            return sum(index.nbytes for index in self._users.values())
+
+    # ------------------------------------------------------------------
+    # Residency and persistence (called with self._lock held)
+    # ------------------------------------------------------------------
+
+    def _resident(self, user_id: str) -> Optional[_UserIndex]:
+        """The user's index, loaded from disk if needed and marked most recently used."""
+        index = self._users.get(user_id)
+        if index is None and self.path is not None:
+            index = self._load(user_id)
+            if index is not None:
+                self._users[user_id] = index
+        if index is not None:
+            self._users.move_to_end(user_id)
+        return index
+
+    def _evict(self, keep: str) -> None:
+        """Unload least recently used users until under memory_limit_bytes."""
+        if self.path is None or self.memory_limit_bytes <= 0:
+            return
+        resident = sum(index.nbytes for index in self._users.values())
+        for user_id in list(self._users):
+            if resident <= self.memory_limit_bytes:
+                break
+            if user_id == keep:
+                continue
+            resident -= self._users.pop(user_id).nbytes
+
+    def _user_dir(self, user_id: str) -> str:
+        return os.path.join(self.path, hashlib.sha256(user_id.encode("utf-8")).hexdigest()[:32])
+
+    def _file(self, user_id: str, name: str) -> str:
+        return os.path.join(self._user_dir(user_id), name)
+
+    def _write_meta(self, user_id: str, dim: int) -> None:
+        if self.path is None:
+            return
+        os.makedirs(self._user_dir(user_id), exist_ok=True)
+        _write_atomic(
+            self._file(user_id, "meta.json"),
+            json.dumps({"user_id": user_id, "dim": dim, "dtype": self.dtype.name}).encode("utf-8"),
+        )
+
+    def _append_files(self, user_id: str, vectors: np.ndarray, texts: List[str], metadatas: List[dict]) -> None:
+        if self.path is None:
+            return
+        # Vectors first: a crash between the two writes leaves surplus rows,
+        # which _load() trims to the number of complete chunk lines.
+        with open(self._file(user_id, "vectors.bin"), "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=self.dtype).tobytes())
+        with open(self._file(user_id, "chunks.jsonl"), "ab") as f:
+            f.write(_chunk_lines(texts, metadatas))
+
+    def _rewrite_files(self, user_id: str, index: _UserIndex) -> None:
+        if self.path is None:
+            return
+        _write_atomic(self._file(user_id, "vectors.bin"), index.matrix[:index.count].tobytes())
+        _write_atomic(
+            self._file(user_id, "chunks.jsonl"),
+            _chunk_lines(index.texts[:index.count], index.metadatas[:index.count]),
+        )
+
+    def _load(self, user_id: str) -> Optional[_UserIndex]:
+        meta = self._read_meta(self._user_dir(user_id))
+        if meta is None:
+            return None
+        dim, stored_dtype = meta["dim"], np.dtype(meta["dtype"])
+        chunks = self._read_chunks(self._file(user_id, "chunks.jsonl"))
+        vectors = np.fromfile(self._file(user_id, "vectors.bin"), dtype=stored_dtype)
+        rows = len(vectors) // dim
+        count = min(rows, len(chunks))
+        vectors = vectors[:count * dim].reshape(count, dim).astype(self.dtype, copy=False)
+
+        index = _UserIndex(dim, self.dtype, capacity=count)
+        index.append(vectors, [c["text"] for c in chunks[:count]], [c["metadata"] for c in chunks[:count]])
+        if count != rows or count != len(chunks) or stored_dtype != self.dtype:
+            # Interrupted append or a VECTOR_NUMPY_DTYPE change: make the
+            # files match what was loaded so later appends line up.
+            self._write_meta(user_id, dim)
+            self._rewrite_files(user_id, index)
+        return index
+
+    @staticmethod
+    def _read_meta(user_dir: str) -> Optional[dict]:
+        try:
+            with open(os.path.join(user_dir, "meta.json"), "rb") as f:
+                return json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _read_chunks(path: str) -> List[dict]:
+        chunks = []
+        try:
+            with open(path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # torn final line
+                    chunks.append(json.loads(line))
+        except FileNotFoundError:
+            pass
+        return chunks
+
+
+def _chunk_lines(texts: List[str], metadatas: List[dict]) -> bytes:
+    return "".join(
+        json.dumps({"text": text, "metadata": metadata or {}}, ensure_ascii=False) + "\n"
+        for text, metadata in zip(texts, metadatas)
+    ).encode("utf-8")
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
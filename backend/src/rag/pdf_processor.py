@@ -1,16 +1,36 @@
+import math
+import multiprocessing
 import os
-from typing import List
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Iterable, Iterator, List, Optional, Tuple
 
 import fitz
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 
+from .chunker import LayoutChunker, TokenCounter
+
 
 MAX_PDF_COUNT = int(os.getenv("MAX_PDF_COUNT", "2"))
 MAX_PDF_SIZE_BYTES = int(os.getenv("MAX_PDF_SIZE_MB", "10")) * 1024 * 1024
 CHUNK_SIZE = int(os.getenv("RAG_CHUNK_SIZE", "512"))
 CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", "64"))
 
+# Processes extracting page text in parallel; 0 or 1 extracts in-process.
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Smaller documents are extracted in-process, where pool overhead would dominate.
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "16"))
+
+# Page ranges in flight per worker. Bounds how much extracted text can pile
+# up ahead of the consumer.
+_RANGES_PER_WORKER = 2
+# PyMuPDF block type for text (1 is an image).
+_TEXT_BLOCK = 0
+
+_extract_pool: Optional[ProcessPoolExecutor] = None
+
 
 class PDFValidationError(ValueError):
     """Raised when an uploaded PDF fails validation."""
@@ -46,12 +66,168 @@ def validate_pdf(
 
     # Check PDF magic bytes — PyMuPDF will also catch this, but an early check
     # gives a clearer error before we attempt to open the document.
-    if not pdf_bytes.startswith(b"%PDF"):
+    if pdf_bytes[:4] != b"%PDF":
         raise PDFValidationError(
             f"'{filename}' does not appear to be a valid PDF file."
         )
 
 
+def start_extract_pool() -> None:
+    """
+    Start the page-extraction worker processes.
+
+    Call once at startup, before the application starts its own worker
+    threads: workers are forked (so they do not re-import the application),
+    and a "fork" pool starts all of them on its first task. Without fork
+    support (e.g. macOS) or with PDF_EXTRACT_WORKERS <= 1, extraction stays
+    in-process.
+    """
+    global _extract_pool
+    if _extract_pool is not None or PDF_EXTRACT_WORKERS <= 1:
+        return
+    if "fork" not in multiprocessing.get_all_start_methods():
+        print("[pdf_processor] fork unavailable; extracting PDFs in-process.")
+        return
+    _extract_pool = ProcessPoolExecutor(
+        max_workers=PDF_EXTRACT_WORKERS,
+        mp_context=multiprocessing.get_context("fork"),
+    )
+    _extract_pool.submit(int).result()
+
+
+def shutdown_extract_pool() -> None:
+    """Stop the extraction workers (called on application shutdown)."""
+    global _extract_pool
+    if _extract_pool is not None:
+        _extract_pool.shutdown(cancel_futures=True)
+        _extract_pool = None
+
+
+def _open_pdf(pdf_bytes: bytes) -> fitz.Document:
+    # A spooled upload (see src/uploads.py) is opened by path, so MuPDF reads
+    # it from disk instead of from a copy in memory.
+    path = getattr(pdf_bytes, "path", None)
+    if path is not None:
+        return fitz.open(path, filetype="pdf")
+    return fitz.open(stream=pdf_bytes, filetype="pdf")
+
+
+def _page_blocks(page: fitz.Page) -> List[str]:
+    """Non-empty text blocks of a page, in reading order."""
+    return [
+        block[4].strip()
+        for block in page.get_text("blocks", sort=True)
+        if block[6] == _TEXT_BLOCK and block[4].strip()
+    ]
+
+
+def _extract_page_range(source: Tuple, start: int, stop: int) -> List[List[str]]:
+    """
+    Worker: open the PDF and extract pages [start, stop).
+
+    source is ("path", file_path) for a spooled upload, or
+    ("shm", shm_name, size) for bytes copied into shared memory.
+    """
+    if source[0] == "path":
+        doc = fitz.open(source[1], filetype="pdf")
+    else:
+        _, shm_name, size = source
+        shm = shared_memory.SharedMemory(name=shm_name, track=False)
+        try:
+            doc = fitz.open(stream=bytes(shm.buf[:size]), filetype="pdf")
+        finally:
+            shm.close()
+    try:
+        return [_page_blocks(doc[number]) for number in range(start, stop)]
+    finally:
+        doc.close()
+
+
+def _iter_pages_parallel(pdf_bytes: bytes, page_count: int) -> Iterator[Tuple[int, List[str]]]:
+    # Each worker opens its own document rather than receiving the bytes
+    # through a pipe: straight from disk for a spooled upload, otherwise from
+    # a single copy in shared memory.
+    path = getattr(pdf_bytes, "path", None)
+    shm = None
+    if path is not None:
+        source = ("path", path)
+    else:
+        shm = shared_memory.SharedMemory(create=True, size=len(pdf_bytes))
+        shm.buf[:len(pdf_bytes)] = pdf_bytes
+        source = ("shm", shm.name, len(pdf_bytes))
+    pending = deque()
+    try:
+        per_range = max(1, math.ceil(page_count / (PDF_EXTRACT_WORKERS * _RANGES_PER_WORKER * 2)))
+        ranges = iter([(start, min(start + per_range, page_count)) for start in range(0, page_count, per_range)])
+
+        def submit(page_range):
+            start, stop = page_range
+            pending.append((start, _extract_pool.submit(_extract_page_range, source, start, stop)))
+
+        for page_range in ranges:
+            submit(page_range)
+            if len(pending) >= PDF_EXTRACT_WORKERS * _RANGES_PER_WORKER:
+                break
+
+        while pending:
+            start, future = pending.popleft()
+            texts = future.result()
+            next_range = next(ranges, None)
+            if next_range is not None:
+                submit(next_range)
+            yield from enumerate(texts, start)
+    finally:
+        for _, future in pending:
+            future.cancel()
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+
+def iter_page_blocks(pdf_bytes: bytes, filename: str) -> Iterator[Tuple[int, List[str]]]:
+    """
+    Yield (page_number, text_blocks) for every page, in order, as pages are extracted.
+
+    Large documents are split into page ranges extracted across the worker
+    pool; at most a few ranges are ahead of the consumer at any time.
+
+    Raises:
+        PDFValidationError: If the PDF cannot be opened.
+    """
+    try:
+        doc = _open_pdf(pdf_bytes)
+    except Exception as e:
+        raise PDFValidationError(f"Could not open '{filename}' as a PDF: {e}") from e
+
+    if _extract_pool is None or doc.page_count < PDF_PARALLEL_MIN_PAGES:
+        try:
+            for number, page in enumerate(doc):
+                yield number, _page_blocks(page)
+        finally:
+            doc.close()
+        return
+
+    page_count = doc.page_count
+    doc.close()
+    yield from _iter_pages_parallel(pdf_bytes, page_count)
+
+
+def iter_page_texts(pdf_bytes: bytes, filename: str) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_number, text) for every page, in order: the page's text
+    blocks separated by newlines. Chunk "offset" metadata indexes into it.
+    """
+    for number, blocks in iter_page_blocks(pdf_bytes, filename):
+        yield number, "\n".join(blocks)
+
+
+def _no_text_error(filename: str) -> PDFValidationError:
+    return PDFValidationError(
+        f"No extractable text found in '{filename}'. "
+        "The PDF may be image-based or encrypted."
+    )
+
+
 def extract_text(pdf_bytes: bytes, filename: str) -> str:
     """
     Extract all text from a PDF document.
@@ -66,30 +242,48 @@ def extract_text(pdf_bytes: bytes, filename: str) -> str:
     Raises:
         PDFValidationError: If the PDF cannot be opened or has no extractable text.
     """
-    try:
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    except Exception as e:
-        raise PDFValidationError(f"Could not open '{filename}' as a PDF: {e}") from e
+    pages_text = [text for _, text in iter_page_texts(pdf_bytes, filename) if text.strip()]
+    if not pages_text:
+        raise _no_text_error(filename)
+    return "\n\n".join(pages_text)
 
-    pages_text = []
-    for page in doc:
-        text = page.get_text("text")
-        if text.strip():
-            pages_text.append(text)
-    doc.close()
 
-    if not pages_text:
-        raise PDFValidationError(
-            f"No extractable text found in '{filename}'. "
-            "The PDF may be image-based or encrypted."
-        )
+def _splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        separators=["\n\n", "\n", ". ", " ", ""],
+    )
 
-    return "\n\n".join(pages_text)
+
+def iter_chunks(
+    pages: Iterable[Tuple[int, List[str]]],
+    filename: str,
+    counter: Optional[TokenCounter] = None,
+) -> Iterator[Document]:
+    """
+    Chunk a stream of (page_number, text_blocks) pairs as it arrives.
+
+    See LayoutChunker: chunks are sized in the embedding model's tokens
+    (counted by `counter`, or approximated without one) and carry page and
+    offset metadata. Memory use is bounded by one page, not the document.
+
+    Raises:
+        PDFValidationError: If the pages contain no text at all.
+    """
+    emitted = False
+    for chunk in LayoutChunker(counter).iter_chunks(pages, filename):
+        emitted = True
+        yield chunk
+    if not emitted:
+        raise _no_text_error(filename)
 
 
 def chunk_text(text: str, filename: str) -> List[Document]:
     """
-    Split extracted text into overlapping chunks with source metadata.
+    Split extracted text into overlapping character-sized chunks with source
+    metadata. Ingestion uses iter_chunks(); this splitter is kept as the
+    baseline for benchmarks/bench_chunking.py.
 
     Args:
         text:     Full extracted text from the PDF.
@@ -98,11 +292,7 @@ def chunk_text(text: str, filename: str) -> List[Document]:
     Returns:
         List of LangChain Document objects, each representing one chunk.
     """
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE,
-        chunk_overlap=CHUNK_OVERLAP,
-        separators=["\n\n", "\n", ". ", " ", ""],
-    )
+    splitter = _splitter()
     chunks = splitter.create_documents(
         texts=[text],
         metadatas=[{"source": filename}],
@@ -130,5 +320,4 @@ def process_pdf(
         PDFValidationError: On any validation or extraction failure.
     """
     validate_pdf(pdf_bytes, filename, current_count)
-    text = extract_text(pdf_bytes, filename)
-    return chunk_text(text, filename)
+    return list(iter_chunks(iter_page_blocks(pdf_bytes, filename), filename))
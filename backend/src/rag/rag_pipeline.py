@@ -1,60 +1,189 @@
 import asyncio
-from typing import Dict, List, Optional
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
 
 from ..providers.factory import get_embedding_provider
 from . import pdf_processor, vector_store
+from .chunker import TokenCounter
+from .embedding_cache import EMBEDDING_CACHE_MAX_ENTRIES, CachedEmbeddings
+from .ingest_cache import IngestCache, IngestedPDF, content_key
 from .pdf_processor import PDFValidationError
 
+# Recent query embeddings kept in memory, keyed by normalised query text.
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "256"))
+
+# Chunks per pipeline batch: one embed_documents() call and one insert each.
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+# Batches allowed to wait between two ingestion stages.
+_STAGE_QUEUE_DEPTH = 2
+
+# Receives ingestion progress counters; see RAGPipeline.ingest_pdf.
+ProgressFn = Callable[[dict], None]
+
+
+class UploadDiscarded(RuntimeError):
+    """Raised when the user's session was reset while their PDF was being ingested."""
+
+
+class _StageQueue:
+    """Bounded hand-off between ingestion stages that gives up once stopped."""
+
+    def __init__(self, stop: threading.Event):
+        self._queue: queue.Queue = queue.Queue(maxsize=_STAGE_QUEUE_DEPTH)
+        self._stop = stop
+
+    def put(self, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self) -> Any:
+        """Next item, or None at the end of the stream or once stopped."""
+        while not self._stop.is_set():
+            try:
+                return self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return None
+
+
+def _report(progress: Optional[ProgressFn], counters: dict) -> None:
+    if progress is None:
+        return
+    try:
+        progress(dict(counters))
+    except Exception as e:
+        # A broken progress consumer must not fail the upload.
+        print(f"[RAGPipeline] Progress callback failed: {e}")
+
 
 class RAGPipeline:
     """
     Orchestrates PDF ingestion and RAG retrieval for all user sessions.
 
-    Thread-safety note: _pdf_metadata is mutated only inside async methods
-    that run in FastAPI's event loop. If you switch to multi-process deployment,
-    move this dict to Redis (keyed by user_id) alongside the session state.
+    Thread-safety note: _pdf_metadata, _pending_uploads and _generations are
+    mutated only from FastAPI's event loop. If you switch to multi-process
+    deployment, move these dicts to Redis (keyed by user_id) alongside the
+    session state.
     """
 
     def __init__(self):
         self._embeddings = None
+        self._embeddings_lock = threading.Lock()
+        # The embedding model's tokenizer, set alongside _embeddings.
+        self._token_counter = TokenCounter()
+        self._embeddings_ready = False
+        self._embedding_stats = {"load_seconds": None, "warmup_seconds": None}
+        self._query_embeddings: "OrderedDict[str, List[float]]" = OrderedDict()
         self._pdf_metadata: Dict[str, List[dict]] = {}
+        # Uploads validated but not yet recorded in _pdf_metadata; they count
+        # towards MAX_PDF_COUNT. _generations is bumped on every reset so
+        # uploads reserved before it are discarded instead of resurrected.
+        self._pending_uploads: Dict[str, int] = {}
+        self._generations: Dict[str, int] = {}
+        self._ingest_cache = IngestCache()
+        # PDFs currently being extracted/embedded, so identical concurrent
+        # uploads share one run.
+        self._ingest_inflight: Dict[str, asyncio.Future] = {}
 
     async def ingest_pdf(
-        self, user_id: str, pdf_bytes: bytes, filename: str
+        self,
+        user_id: str,
+        pdf_bytes: bytes,
+        filename: str,
+        progress: Optional[ProgressFn] = None,
+        reservation: Optional[int] = None,
     ) -> dict:
         """
         Full ingestion pipeline for a single PDF.
 
+        Runs as three overlapping stages joined by bounded queues: pages are
+        extracted and chunked, chunks are embedded in batches of
+        EMBEDDING_BATCH_SIZE, and each embedded batch is inserted into the
+        user's collection while the next one is being embedded.
+
+        Extracted chunks and their vectors are cached by content hash, so a
+        PDF that has been ingested before (by anyone) skips extraction and
+        embedding and is copied straight into the user's collection.
+
+        If any stage fails, the batches already inserted for this upload are
+        removed again, so a failed upload leaves nothing behind.
+
         Args:
             user_id:   Authenticated user's UUID.
             pdf_bytes: Raw bytes of the uploaded PDF file.
             filename:  Original filename, stored in chunk metadata.
+            progress:  Optional callback, invoked from a worker thread after
+                       every inserted batch with a dict of counters
+                       (pages_extracted, chunks_embedded, chunks_stored,
+                       batches_stored, total_chunks when known).
+            reservation: Token from reserve_upload() if the upload was
+                       validated earlier (e.g. when it was queued as a job);
+                       otherwise it is validated and reserved here.
 
         Returns:
             dict with keys: filename, chunks (int), pdf_count (int).
 
         Raises:
             PDFValidationError: On size, count, or format violations.
+            UploadDiscarded:    If the session was reset in the meantime.
         """
-        current_count = self.get_pdf_count(user_id)
+        if reservation is None:
+            reservation = self.reserve_upload(user_id, pdf_bytes, filename)
+        try:
+            return await self._ingest_reserved(user_id, pdf_bytes, filename, progress, reservation)
+        finally:
+            self._release_upload(user_id, reservation)
 
-        chunks = await asyncio.get_event_loop().run_in_executor(
-            None,
-            pdf_processor.process_pdf,
-            pdf_bytes,
-            filename,
-            current_count,
-        )
+    async def _ingest_reserved(
+        self,
+        user_id: str,
+        pdf_bytes: bytes,
+        filename: str,
+        progress: Optional[ProgressFn],
+        reservation: int,
+    ) -> dict:
+        if self._generations.get(user_id, 0) != reservation:
+            raise UploadDiscarded(f"The session was reset before '{filename}' was processed.")
 
-        embeddings = self._get_embeddings()
+        loop = asyncio.get_event_loop()
+        embeddings = await self._get_embeddings_async()
+        key = await loop.run_in_executor(None, content_key, pdf_bytes, embeddings, self._token_counter)
+        upload_id = uuid.uuid4().hex
 
-        stored = await asyncio.get_event_loop().run_in_executor(
-            None,
-            vector_store.upsert,
-            user_id,
-            chunks,
-            embeddings,
-        )
+        stored = None
+        document = self._ingest_cache.get(key)
+        if document is None:
+            document, stored = await self._ingest_uncached(
+                key, user_id, upload_id, pdf_bytes, filename, embeddings, progress
+            )
+        if stored is None:
+            stored = await loop.run_in_executor(
+                None,
+                self._store_cached,
+                user_id,
+                upload_id,
+                document,
+                filename,
+                embeddings,
+                progress,
+            )
+
+        if self._generations.get(user_id, 0) != reservation:
+            await loop.run_in_executor(None, self._discard_upload, user_id, upload_id)
+            raise UploadDiscarded(f"The session was reset while '{filename}' was being processed.")
 
         if user_id not in self._pdf_metadata:
             self._pdf_metadata[user_id] = []
@@ -66,6 +195,209 @@ class RAGPipeline:
             "pdf_count": len(self._pdf_metadata[user_id]),
         }
 
+    async def _ingest_uncached(
+        self,
+        key: str,
+        user_id: str,
+        upload_id: str,
+        pdf_bytes: bytes,
+        filename: str,
+        embeddings: Any,
+        progress: Optional[ProgressFn],
+    ) -> Tuple[IngestedPDF, Optional[int]]:
+        """
+        Run the full pipeline, sharing the work with identical in-flight uploads.
+
+        Returns:
+            (document, chunks stored for this user). The count is None when
+            the document came from another upload and still has to be stored.
+        """
+        while (inflight := self._ingest_inflight.get(key)) is not None:
+            try:
+                return await asyncio.shield(inflight), None
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # The upload we were waiting on was abandoned; take over.
+
+        future = asyncio.get_running_loop().create_future()
+        self._ingest_inflight[key] = future
+        try:
+            document, stored = await asyncio.get_event_loop().run_in_executor(
+                None,
+                self._extract_embed_store,
+                key,
+                user_id,
+                upload_id,
+                pdf_bytes,
+                filename,
+                embeddings,
+                progress,
+            )
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters re-raise it; with none, asyncio would log it as unretrieved.
+            future.exception()
+            raise
+        finally:
+            self._ingest_inflight.pop(key, None)
+
+        future.set_result(document)
+        return document, stored
+
+    def _extract_embed_store(
+        self,
+        key: str,
+        user_id: str,
+        upload_id: str,
+        pdf_bytes: bytes,
+        filename: str,
+        embeddings: Any,
+        progress: Optional[ProgressFn],
+    ) -> Tuple[IngestedPDF, int]:
+        """
+        extract → embed → insert, one thread per stage.
+
+        Extraction and insertion run on their own threads; embedding runs on
+        the calling thread. At most _STAGE_QUEUE_DEPTH batches wait between
+        two stages, which bounds memory and lets embedding of batch N
+        overlap insertion of batch N-1.
+        """
+        stop = threading.Event()
+        to_embed = _StageQueue(stop)
+        to_insert = _StageQueue(stop)
+        errors: List[BaseException] = []
+        counters = {"pages_extracted": 0, "chunks_embedded": 0, "chunks_stored": 0, "batches_stored": 0}
+
+        def pages():
+            for number, blocks in pdf_processor.iter_page_blocks(pdf_bytes, filename):
+                counters["pages_extracted"] = number + 1
+                yield number, blocks
+
+        def extract() -> None:
+            try:
+                batch: List[Document] = []
+                for chunk in pdf_processor.iter_chunks(pages(), filename, self._token_counter):
+                    batch.append(chunk)
+                    if len(batch) >= EMBEDDING_BATCH_SIZE:
+                        if not to_embed.put(batch):
+                            return
+                        batch = []
+                if batch and not to_embed.put(batch):
+                    return
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+                return
+            to_embed.put(None)
+
+        def insert() -> None:
+            try:
+                while (item := to_insert.get()) is not None:
+                    chunks, vectors = item
+                    counters["chunks_stored"] += self._insert_batch(
+                        user_id, upload_id, chunks, embeddings, vectors
+                    )
+                    counters["batches_stored"] += 1
+                    _report(progress, counters)
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+
+        texts: List[str] = []
+        metadatas: List[dict] = []
+        vectors: List[List[float]] = []
+
+        extractor = threading.Thread(target=extract, daemon=True)
+        inserter = threading.Thread(target=insert, daemon=True)
+        extractor.start()
+        inserter.start()
+        try:
+            while (batch := to_embed.get()) is not None:
+                batch_texts = [chunk.page_content for chunk in batch]
+                batch_vectors = embeddings.embed_documents(batch_texts)
+                counters["chunks_embedded"] += len(batch)
+                texts.extend(batch_texts)
+                metadatas.extend(chunk.metadata for chunk in batch)
+                vectors.extend(batch_vectors)
+                if not to_insert.put((batch, batch_vectors)):
+                    break
+            else:
+                to_insert.put(None)
+                inserter.join()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            # Both threads exit at their next queue operation once stop is
+            # set. Waiting for the extractor too means nothing still reads
+            # pdf_bytes (or holds extraction workers) when the caller
+            # releases the upload.
+            stop.set()
+            extractor.join()
+            inserter.join()
+
+        if errors:
+            self._discard_upload(user_id, upload_id)
+            raise errors[0]
+
+        document = self._ingest_cache.put(key, texts, metadatas, vectors)
+        return document, counters["chunks_stored"]
+
+    def _store_cached(
+        self,
+        user_id: str,
+        upload_id: str,
+        document: IngestedPDF,
+        filename: str,
+        embeddings: Any,
+        progress: Optional[ProgressFn],
+    ) -> int:
+        """Insert an already-embedded document into the user's collection, batch by batch."""
+        total = len(document.texts)
+        counters = {
+            "pages_extracted": None,
+            "chunks_embedded": total,
+            "chunks_stored": 0,
+            "batches_stored": 0,
+            "total_chunks": total,
+        }
+        try:
+            for start in range(0, total, EMBEDDING_BATCH_SIZE):
+                stop = start + EMBEDDING_BATCH_SIZE
+                chunks = [
+                    Document(page_content=text, metadata={**metadata, "source": filename})
+                    for text, metadata in zip(document.texts[start:stop], document.metadatas[start:stop])
+                ]
+                counters["chunks_stored"] += self._insert_batch(
+                    user_id, upload_id, chunks, embeddings, document.vectors[start:stop]
+                )
+                counters["batches_stored"] += 1
+                _report(progress, counters)
+        except Exception:
+            self._discard_upload(user_id, upload_id)
+            raise
+        return counters["chunks_stored"]
+
+    @staticmethod
+    def _insert_batch(
+        user_id: str, upload_id: str, chunks: List[Document], embeddings: Any, vectors: Any
+    ) -> int:
+        tagged = [
+            Document(page_content=chunk.page_content, metadata={**chunk.metadata, "upload_id": upload_id})
+            for chunk in chunks
+        ]
+        return vector_store.upsert(user_id, tagged, embeddings, vectors)
+
+    @staticmethod
+    def _discard_upload(user_id: str, upload_id: str) -> None:
+        try:
+            vector_store.delete_upload(user_id, upload_id)
+        except Exception as e:
+            print(f"[RAGPipeline] Could not remove partial upload for user {user_id[:8]}...: {e}")
+
     async def retrieve_context(self, user_id: str, query: str) -> str | None:
         """
         Retrieve the most relevant document chunks for a query.
@@ -85,15 +417,17 @@ class RAGPipeline:
         if not self._pdf_metadata.get(user_id):
             return None
 
-        embeddings = self._get_embeddings()
+        embeddings = await self._get_embeddings_async()
 
         try:
+            query_embedding = await self._embed_query(query, embeddings)
             relevant_chunks = await asyncio.get_event_loop().run_in_executor(
                 None,
                 vector_store.query,
                 user_id,
                 query,
                 embeddings,
+                query_embedding,
             )
         except Exception as e:
             print(f"[RAGPipeline] retrieve_context failed for user {user_id[:8]}...: {e}")
@@ -109,6 +443,21 @@ class RAGPipeline:
         )
         return context_block
 
+    async def _embed_query(self, query: str, embeddings: Any) -> List[float]:
+        """Embed a query, reusing the vector for recently seen (normalised) queries."""
+        key = " ".join(query.lower().split())
+        cached = self._query_embeddings.get(key)
+        if cached is not None:
+            self._query_embeddings.move_to_end(key)
+            return cached
+
+        vector = await asyncio.get_event_loop().run_in_executor(None, embeddings.embed_query, query)
+        if QUERY_EMBEDDING_CACHE_SIZE > 0:
+            self._query_embeddings[key] = vector
+            while len(self._query_embeddings) > QUERY_EMBEDDING_CACHE_SIZE:
+                self._query_embeddings.popitem(last=False)
+        return vector
+
     def delete_user_data(self, user_id: str) -> None:
         """
         Remove all RAG state for a user (Chroma collection + PDF count).
@@ -120,20 +469,156 @@ class RAGPipeline:
         """
         vector_store.delete_user_collection(user_id)
         self._pdf_metadata.pop(user_id, None)
+        # In-flight uploads of this session are discarded when they finish
+        # and no longer hold a slot.
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        self._pending_uploads.pop(user_id, None)
+
+    def expire_user_data(self, user_id: str) -> None:
+        """
+        Handle a user's session expiring.
+
+        In ephemeral mode this deletes their data, exactly like a reset. In
+        persistent mode the documents are kept on disk for their next
+        session and unloaded from memory where the backend allows it (see
+        vector_store.unload_user).
+        """
+        if vector_store.VECTOR_STORE_MODE != "persistent":
+            self.delete_user_data(user_id)
+        else:
+            vector_store.unload_user(user_id)
+
+    def restore_metadata(self) -> None:
+        """
+        Rebuild per-user PDF metadata from the vector store.
+
+        Called once at startup. A no-op in ephemeral mode, where the store
+        always starts empty.
+        """
+        if vector_store.VECTOR_STORE_MODE != "persistent":
+            return
+        self._pdf_metadata = vector_store.list_user_documents()
+        print(f"[RAGPipeline] Restored PDF metadata for {len(self._pdf_metadata)} user(s).")
+
+    def reserve_upload(self, user_id: str, pdf_bytes: bytes, filename: str) -> int:
+        """
+        Validate an upload and hold one of the user's MAX_PDF_COUNT slots for it.
+
+        Returns:
+            A reservation token for ingest_pdf(), which releases the slot
+            when it finishes.
+
+        Raises:
+            PDFValidationError: On size, count, or format violations.
+        """
+        pdf_processor.validate_pdf(pdf_bytes, filename, self.get_pdf_count(user_id))
+        self._pending_uploads[user_id] = self._pending_uploads.get(user_id, 0) + 1
+        return self._generations.get(user_id, 0)
+
+    def _release_upload(self, user_id: str, reservation: int) -> None:
+        if self._generations.get(user_id, 0) != reservation:
+            return  # Already released by the reset that invalidated it.
+        remaining = self._pending_uploads.get(user_id, 0) - 1
+        if remaining > 0:
+            self._pending_uploads[user_id] = remaining
+        else:
+            self._pending_uploads.pop(user_id, None)
 
     def get_pdf_count(self, user_id: str) -> int:
-        """Return the number of PDFs currently indexed for a user."""
-        return len(self._pdf_metadata.get(user_id, []))
+        """
+        Return the number of PDFs counting towards MAX_PDF_COUNT for a user:
+        those indexed plus those still being ingested.
+        """
+        return len(self._pdf_metadata.get(user_id, [])) + self._pending_uploads.get(user_id, 0)
+
+    def get_pending_upload_count(self, user_id: str) -> int:
+        """Return the number of the user's PDFs that are queued or being ingested."""
+        return self._pending_uploads.get(user_id, 0)
 
     def get_pdf_list(self, user_id: str) -> List[dict]:
         """Return metadata list for all PDFs indexed for a user."""
         return self._pdf_metadata.get(user_id, [])
 
+    def load_embeddings_async(self) -> None:
+        """Load and warm the embedding model in a background daemon thread."""
+        thread = threading.Thread(target=self._load_embeddings, daemon=True)
+        thread.start()
+
+    def _load_embeddings(self) -> None:
+        try:
+            start = time.perf_counter()
+            embeddings = self._get_embeddings()
+            self._embedding_stats["load_seconds"] = round(time.perf_counter() - start, 3)
+
+            # One forward pass so the first real request does not pay for
+            # lazy initialisation inside the model.
+            start = time.perf_counter()
+            embeddings.embed_query("warm-up")
+            self._embedding_stats["warmup_seconds"] = round(time.perf_counter() - start, 3)
+
+            self._embeddings_ready = True
+            print(
+                f"[RAGPipeline] Embedding model loaded "
+                f"(load {self._embedding_stats['load_seconds']}s, "
+                f"warm-up {self._embedding_stats['warmup_seconds']}s)."
+            )
+        except Exception as e:
+            print(f"[RAGPipeline] Failed to load embedding model: {e}")
+
+    def is_embedding_model_ready(self) -> bool:
+        """Return True once the embedding model has been loaded and warmed."""
+        return self._embeddings_ready
+
+    def get_embedding_model_status(self) -> dict:
+        """Load/warm-up timings and query cache size for the /ready endpoint."""
+        return {
+            **self._embedding_stats,
+            "query_cache_entries": len(self._query_embeddings),
+        }
+
+    def get_embedding_cache_stats(self) -> dict:
+        """Chunk embedding cache hit rate (empty until the model is loaded or if disabled)."""
+        if isinstance(self._embeddings, CachedEmbeddings):
+            return self._embeddings.stats()
+        return {}
+
     def _get_embeddings(self):
-        """Lazily initialise and cache the embedding provider."""
-        if self._embeddings is None:
-            provider = get_embedding_provider()
-            self._embeddings = provider.get_embeddings()
+        """
+        Return the embedding model, creating it on first call.
+
+        Normally already loaded by load_embeddings_async() at startup; a
+        request that arrives earlier waits for that load instead of
+        starting a second one.
+        """
+        if self._embeddings is not None:
+            return self._embeddings
+        with self._embeddings_lock:
+            if self._embeddings is None:
+                self._embeddings = self._create_embeddings()
         return self._embeddings
 
+    async def _get_embeddings_async(self):
+        """
+        _get_embeddings() for coroutines: while the startup load holds the
+        lock, waiting for it must not block the event loop.
+        """
+        if self._embeddings is not None:
+            return self._embeddings
+        return await asyncio.get_event_loop().run_in_executor(None, self._get_embeddings)
+
+    def _create_embeddings(self) -> Any:
+        provider = get_embedding_provider()
+        embeddings = provider.get_embeddings()
+        try:
+            self._token_counter = TokenCounter(provider.get_tokenizer())
+        except Exception as e:
+            print(f"[RAGPipeline] Tokenizer unavailable, approximating chunk sizes: {e}")
+        if EMBEDDING_CACHE_MAX_ENTRIES > 0:
+            try:
+                embeddings = CachedEmbeddings(embeddings)
+            except Exception as e:
+                # e.g. a read-only cache directory — embed uncached.
+                print(f"[RAGPipeline] Embedding cache unavailable: {e}")
+        return embeddings
+
 rag_pipeline = RAGPipeline()
@@ -1,5 +1,5 @@
 """
-vector_store.py — ChromaDB wrapper with per-user collection isolation.
+vector_store.py — per-user vector storage, backed by ChromaDB or NumPy.
 
 Each user gets their own Chroma collection (`user_{user_id}`), which provides
 the same logical isolation as Pinecone namespaces without any external service.
@@ -9,18 +9,38 @@ This threshold is the minimum cosine similarity score a chunk must score to be
 included in the returned context. Raise it for stricter relevance; lower it if
 you are getting too few results.
 
+Storage is in-memory by default. Set VECTOR_STORE_MODE=persistent to keep
+collections on disk across restarts; a user's collection is then loaded on
+first access. Only the NumPy backend also evicts under a memory budget
+(VECTOR_STORE_MEMORY_LIMIT_MB): Chroma has no API to unload a single
+collection, so with Chroma every collection touched since startup stays
+resident.
+
+VECTOR_BACKEND=numpy replaces Chroma with an in-process brute-force index
+(numpy_index.py): exact search over one contiguous matrix per user, which
+is faster and leaner than HNSW at the corpus sizes MAX_PDF_COUNT allows.
+In persistent mode it appends each user's chunks to plain files under
+VECTOR_STORE_PATH and unloads the least recently used users once resident
+data exceeds VECTOR_STORE_MEMORY_LIMIT_MB.
+
 Swapping to Qdrant or Pinecone later: implement the same interface
 (upsert / query / delete_user_collection) backed by a different client and
 update rag_pipeline.py to use it — zero changes to server.py or client.py.
 """
 
+import math
 import os
-from typing import Any, List
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 
 import chromadb
-from langchain_chroma import Chroma
+from chromadb.config import Settings
 from langchain_core.documents import Document
 
+from .numpy_index import NumpyVectorIndex
+
 # ---------------------------------------------------------------------------
 # Configuration
 # ---------------------------------------------------------------------------
@@ -28,42 +48,181 @@ from langchain_core.documents import Document
 SIMILARITY_THRESHOLD = float(os.getenv("RAG_SIMILARITY_THRESHOLD", "0.70"))
 TOP_K = int(os.getenv("RAG_TOP_K", "5"))
 
-# Single in-memory ChromaDB client shared across all collections.
+# "ephemeral"  - in-memory only; everything is lost on restart (default)
+# "persistent" - collections live on disk under VECTOR_STORE_PATH and are
+#                loaded into memory on first use
+VECTOR_STORE_MODE = os.getenv("VECTOR_STORE_MODE", "ephemeral").strip().lower()
+VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", "./chroma_data")
+# Persistent NumPy backend only: resident vectors + chunk text above which
+# least-recently-used users are unloaded (0 = no limit).
+VECTOR_STORE_MEMORY_LIMIT_BYTES = int(os.getenv("VECTOR_STORE_MEMORY_LIMIT_MB", "512")) * 1024 * 1024
+
+# "chroma" - ChromaDB collections (default)
+# "numpy"  - in-process brute-force index; VECTOR_NUMPY_DTYPE=float16 halves
+#            its memory at a small cost in score precision
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").strip().lower()
+VECTOR_NUMPY_DTYPE = os.getenv("VECTOR_NUMPY_DTYPE", "float32").strip().lower()
+
+_COLLECTION_PREFIX = "user_"
+
+
+def _create_client():
+    """Build the Chroma client for the configured VECTOR_STORE_MODE."""
+    if VECTOR_BACKEND == "numpy":
+        return None
+    if VECTOR_BACKEND != "chroma":
+        raise ValueError(
+            f"Unsupported VECTOR_BACKEND: '{VECTOR_BACKEND}'. "
+            f"Supported values: 'chroma', 'numpy'."
+        )
+    if VECTOR_STORE_MODE == "persistent":
+        if os.getenv("VECTOR_STORE_MEMORY_LIMIT_MB"):
+            print(
+                "[vector_store] VECTOR_STORE_MEMORY_LIMIT_MB is ignored with Chroma, which cannot "
+                "unload collections; use VECTOR_BACKEND=numpy for a memory budget."
+            )
+        return chromadb.PersistentClient(
+            path=VECTOR_STORE_PATH,
+            settings=Settings(anonymized_telemetry=False),
+        )
+    if VECTOR_STORE_MODE == "ephemeral":
+        return chromadb.EphemeralClient()
+    raise ValueError(
+        f"Unsupported VECTOR_STORE_MODE: '{VECTOR_STORE_MODE}'. "
+        f"Supported values: 'ephemeral', 'persistent'."
+    )
+
+
+def _create_numpy_index() -> Optional[NumpyVectorIndex]:
+    if VECTOR_BACKEND != "numpy":
+        return None
+    if VECTOR_STORE_MODE == "persistent":
+        return NumpyVectorIndex(
+            VECTOR_NUMPY_DTYPE,
+            path=VECTOR_STORE_PATH,
+            memory_limit_bytes=VECTOR_STORE_MEMORY_LIMIT_BYTES,
+        )
+    if VECTOR_STORE_MODE == "ephemeral":
+        return NumpyVectorIndex(VECTOR_NUMPY_DTYPE)
+    raise ValueError(
+        f"Unsupported VECTOR_STORE_MODE: '{VECTOR_STORE_MODE}'. "
+        f"Supported values: 'ephemeral', 'persistent'."
+    )
+
+
+# Single ChromaDB client shared across all collections.
 # Replace with chromadb.HttpClient(...) to point at a standalone Chroma server.
-_chroma_client = chromadb.EphemeralClient()
+_chroma_client = _create_client()
+_numpy_index = _create_numpy_index()
+
+# Bounded LRU of user_id -> Collection handles, so hot paths skip the
+# name lookup. Entries are dropped in delete_user_collection().
+_HANDLE_CACHE_SIZE = int(os.getenv("VECTOR_STORE_HANDLE_CACHE_SIZE", "256"))
+_handles: "OrderedDict[str, Any]" = OrderedDict()
+_handle_lock = threading.Lock()
 
 
 def _collection_name(user_id: str) -> str:
     """Stable, Chroma-safe collection name for a given user."""
     # Chroma collection names must be 3-63 chars, alphanumeric + hyphens/underscores.
-    return f"user_{user_id.replace('-', '_')}"
+    return f"{_COLLECTION_PREFIX}{user_id.replace('-', '_')}"
+
+
+def _get_collection(user_id: str, create: bool = False):
+    """
+    Return the user's Chroma collection handle, caching it for later calls.
 
+    Args:
+        user_id: The authenticated user's UUID.
+        create:  Create the collection if it does not exist yet.
+
+    Returns:
+        The Collection, or None if it does not exist and create is False.
+    """
+    with _handle_lock:
+        collection = _handles.get(user_id)
+        if collection is not None:
+            _handles.move_to_end(user_id)
+            return collection
+
+    if create:
+        collection = _chroma_client.get_or_create_collection(
+            _collection_name(user_id),
+            # Lets list_user_documents() map collections back to users.
+            metadata={"user_id": user_id},
+        )
+    else:
+        try:
+            collection = _chroma_client.get_collection(_collection_name(user_id))
+        except Exception:
+            return None
+
+    with _handle_lock:
+        _handles[user_id] = collection
+        _handles.move_to_end(user_id)
+        while len(_handles) > _HANDLE_CACHE_SIZE:
+            _handles.popitem(last=False)
+    return collection
+
+
+def _relevance_score(distance: float, space: str) -> float:
+    """Convert a Chroma distance to a [0, 1] relevance score (as LangChain does)."""
+    if space == "cosine":
+        return 1.0 - distance
+    if space == "ip":
+        return 1.0 - distance if distance > 0 else -1.0 * distance
+    # "l2" — Chroma reports squared L2 distance; for unit-normalised
+    # embeddings that is 2 - 2·cos, in [0, 4].
+    return 1.0 - distance / math.sqrt(2)
 
-def upsert(user_id: str, chunks: List[Document], embeddings: Any) -> int:
+
+def upsert(
+    user_id: str,
+    chunks: List[Document],
+    embeddings: Any,
+    vectors: Optional[Any] = None,
+) -> int:
     """
-    Embed and store document chunks into the user's Chroma collection.
+    Embed and store document chunks into the user's collection.
 
-    If the collection does not exist it will be created automatically by
-    LangChain's Chroma wrapper.
+    The collection is created on first upload. Chunks are embedded in one
+    embed_documents() call and written straight to the backend.
 
     Args:
         user_id:    The authenticated user's UUID.
         chunks:     List of LangChain Document objects to store.
         embeddings: LangChain Embeddings instance (from EmbeddingProvider).
+        vectors:    Precomputed embeddings, one row per chunk; when given,
+                    the embedding model is not called.
 
     Returns:
         Number of chunks stored.
     """
-    Chroma.from_documents(
-        documents=chunks,
-        embedding=embeddings,
-        client=_chroma_client,
-        collection_name=_collection_name(user_id),
+    if not chunks:
+        return 0
+
+    texts = [chunk.page_content for chunk in chunks]
+    if vectors is None:
+        vectors = embeddings.embed_documents(texts)
+    if _numpy_index is not None:
+        return _numpy_index.add(user_id, texts, [chunk.metadata for chunk in chunks], vectors)
+
+    collection = _get_collection(user_id, create=True)
+    collection.add(
+        ids=[str(uuid.uuid4()) for _ in chunks],
+        documents=texts,
+        metadatas=[chunk.metadata or None for chunk in chunks],
+        embeddings=vectors,
     )
     return len(chunks)
 
 
-def query(user_id: str, query_text: str, embeddings: Any) -> List[str]:
+def query(
+    user_id: str,
+    query_text: str,
+    embeddings: Any,
+    query_embedding: Optional[List[float]] = None,
+) -> List[str]:
     """
     Perform a similarity search against the user's collection.
 
@@ -71,53 +230,101 @@ def query(user_id: str, query_text: str, embeddings: Any) -> List[str]:
     Results are ordered by descending relevance score.
 
     Args:
-        user_id:     The authenticated user's UUID.
-        query_text:  The user's natural-language question.
-        embeddings:  LangChain Embeddings instance (from EmbeddingProvider).
+        user_id:         The authenticated user's UUID.
+        query_text:      The user's natural-language question.
+        embeddings:      LangChain Embeddings instance (from EmbeddingProvider).
+        query_embedding: Precomputed embedding of query_text; when given,
+                         the embedding model is not called.
 
     Returns:
-        List of chunk text strings (empty list if no results pass threshold).
+        List of chunk texts, each headed by its source and page range when
+        known (empty list if no results pass threshold).
 
     Raises:
         Exception: Propagated from the embedding model on failure (e.g. quota).
     """
-    try:
-        _chroma_client.get_collection(_collection_name(user_id))
-    except Exception:
+    if _numpy_index is not None:
+        results = _query_numpy(user_id, query_text, embeddings, query_embedding)
+    else:
+        results = _query_chroma(user_id, query_text, embeddings, query_embedding)
+    if results is None:
         # Collection does not exist — user has not uploaded any PDFs yet.
         print(f"[vector_store] No collection found for user {user_id[:8]}...")
         return []
 
-    vectorstore = Chroma(
-        client=_chroma_client,
-        collection_name=_collection_name(user_id),
-        embedding_function=embeddings,
-    )
-
-    try:
-        results = vectorstore.similarity_search_with_relevance_scores(
-            query_text, k=TOP_K
-        )
-    except Exception as e:
-        print(f"[vector_store] Similarity search failed for user {user_id[:8]}...: {e}")
-        raise
-
     # Log scores to help tune RAG_SIMILARITY_THRESHOLD
     print(f"[vector_store] Query scores for user {user_id[:8]}...: "
-          + str([(round(score, 3), doc.metadata.get('source', '?')) for doc, score in results]))
+          + str([(round(score, 3), metadata.get('source', '?')) for _, metadata, score in results]))
 
     matched = [
-        doc.page_content
-        for doc, score in results
+        _with_provenance(text, metadata)
+        for text, metadata, score in results
         if score >= SIMILARITY_THRESHOLD
     ]
     print(f"[vector_store] {len(matched)}/{len(results)} chunks passed threshold {SIMILARITY_THRESHOLD}")
     return matched
 
 
+def _with_provenance(text: str, metadata: dict) -> str:
+    """Prefix a chunk with "[file.pdf, p. 3]" so answers can cite their page."""
+    page, page_end = metadata.get("page"), metadata.get("page_end")
+    if page is None:
+        # Chunks stored before page metadata was recorded.
+        return text
+    pages = f"p. {page}" if page_end in (None, page) else f"pp. {page}-{page_end}"
+    return f"[{metadata.get('source', '?')}, {pages}]\n{text}"
+
+
+def _query_chroma(
+    user_id: str,
+    query_text: str,
+    embeddings: Any,
+    query_embedding: Optional[List[float]],
+) -> Optional[List[Tuple[str, dict, float]]]:
+    """Top-k (text, metadata, relevance) from Chroma; None if there is no collection."""
+    collection = _get_collection(user_id)
+    if collection is None:
+        return None
+
+    if query_embedding is None:
+        query_embedding = embeddings.embed_query(query_text)
+
+    try:
+        response = collection.query(
+            query_embeddings=[query_embedding],
+            n_results=TOP_K,
+            include=["documents", "metadatas", "distances"],
+        )
+    except Exception as e:
+        print(f"[vector_store] Similarity search failed for user {user_id[:8]}...: {e}")
+        raise
+
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
+    return [
+        (text, metadata or {}, _relevance_score(distance, space))
+        for text, metadata, distance in zip(
+            response["documents"][0], response["metadatas"][0], response["distances"][0]
+        )
+    ]
+
+
+def _query_numpy(
+    user_id: str,
+    query_text: str,
+    embeddings: Any,
+    query_embedding: Optional[List[float]],
+) -> Optional[List[Tuple[str, dict, float]]]:
+    """Top-k (text, metadata, relevance) from the NumPy index; None if the user has none."""
+    if not _numpy_index.has_user(user_id):
+        return None
+    if query_embedding is None:
+        query_embedding = embeddings.embed_query(query_text)
+    return _numpy_index.search(user_id, query_embedding, TOP_K)
+
+
 def delete_user_collection(user_id: str) -> None:
     """
-    Delete the user's entire Chroma collection.
+    Delete the user's entire collection.
 
     Called on session reset or TTL expiry to ensure no document data persists
     beyond the user's active session.
@@ -125,8 +332,84 @@ def delete_user_collection(user_id: str) -> None:
     Args:
         user_id: The authenticated user's UUID.
     """
+    if _numpy_index is not None:
+        _numpy_index.delete(user_id)
+        return
+    with _handle_lock:
+        _handles.pop(user_id, None)
     try:
         _chroma_client.delete_collection(_collection_name(user_id))
     except Exception:
         # Collection may not exist (user never uploaded a PDF); ignore.
         pass
+
+
+def unload_user(user_id: str) -> None:
+    """
+    Release the memory held for a user whose session ended, keeping their
+    data on disk (persistent mode). With Chroma only the cached handle can
+    be dropped.
+    """
+    if _numpy_index is not None:
+        _numpy_index.unload(user_id)
+        return
+    with _handle_lock:
+        _handles.pop(user_id, None)
+
+
+def delete_upload(user_id: str, upload_id: str) -> None:
+    """
+    Delete the chunks stored by one upload (metadata "upload_id").
+
+    Used to roll back an ingestion that failed after some of its batches
+    had already been inserted.
+    """
+    if _numpy_index is not None:
+        _numpy_index.delete_where(user_id, "upload_id", upload_id)
+        return
+    collection = _get_collection(user_id)
+    if collection is not None:
+        collection.delete(where={"upload_id": upload_id})
+
+
+def list_user_documents() -> Dict[str, List[dict]]:
+    """
+    Summarise every stored collection as {user_id: [{filename, chunks}, ...]}.
+
+    Used at startup in persistent mode to rebuild the pipeline's per-user PDF
+    metadata. Reads chunk metadata only — no embeddings are loaded.
+    """
+    if _numpy_index is not None:
+        return {
+            user_id: _summarise_uploads(metadatas)
+            for user_id, metadatas in _numpy_index.list_metadatas().items()
+        }
+    documents: Dict[str, List[dict]] = {}
+    for collection in _chroma_client.list_collections():
+        if not collection.name.startswith(_COLLECTION_PREFIX):
+            continue
+        user_id = (collection.metadata or {}).get("user_id")
+        if not user_id:
+            continue
+
+        documents[user_id] = _summarise_uploads(collection.get(include=["metadatas"])["metadatas"])
+    return documents
+
+
+def _summarise_uploads(metadatas: List[Optional[dict]]) -> List[dict]:
+    """
+    Group chunk metadata into one {filename, chunks} entry per upload.
+
+    Chunks are grouped by upload_id, so two uploads of the same filename
+    count as two PDFs; chunks stored before upload_id was recorded fall back
+    to grouping by filename.
+    """
+    uploads: Dict[Tuple[str, str], dict] = {}
+    for metadata in metadatas:
+        metadata = metadata or {}
+        source = metadata.get("source", "document.pdf")
+        upload_id = metadata.get("upload_id")
+        key = ("upload", upload_id) if upload_id else ("source", source)
+        entry = uploads.setdefault(key, {"filename": source, "chunks": 0})
+        entry["chunks"] += 1
+    return list(uploads.values())
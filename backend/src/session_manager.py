@@ -1,7 +1,7 @@
 import os
 import time
 import threading
-from typing import Dict, Tuple
+from typing import Dict, Optional, Tuple
 
 from .client import Agent
 from .rag.rag_pipeline import rag_pipeline
@@ -46,6 +46,17 @@ class SessionManager:
             self._sessions[user_id] = (agent, time.monotonic())
             return agent
 
+    def get_session(self, user_id: str) -> Optional[Agent]:
+        """
+        Return the existing Agent for the user, or None if there is none.
+        Unlike get_or_create_session, never creates a session and does not
+        count as activity (the last-accessed timestamp is left alone).
+        """
+        with self._lock:
+            self._cleanup_expired_sessions()
+            entry = self._sessions.get(user_id)
+            return entry[0] if entry is not None else None
+
     def reset_session(self, user_id: str) -> None:
         """
         Destroy the session for a user, forcing a fresh Agent on next access.
@@ -58,8 +69,8 @@ class SessionManager:
     def _cleanup_expired_sessions(self) -> None:
         """
         Remove sessions that have been idle longer than SESSION_TTL_SECONDS.
-        Also purges RAG data for each expired user.
-        Must be called while holding self._lock.
+        Also expires RAG data for each user (purged unless the vector store
+        is persistent). Must be called while holding self._lock.
         """
         now = time.monotonic()
         expired = [
@@ -69,7 +80,7 @@ class SessionManager:
         ]
         for uid in expired:
             del self._sessions[uid]
-            rag_pipeline.delete_user_data(uid)
+            rag_pipeline.expire_user_data(uid)
 
 
 # Singleton instance shared across the application lifetime
@@ -1,7 +1,38 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 from .providers.factory import get_stt_provider
 from .providers.base import SpeechToTextProvider
+from .uploads import close_upload
+
+# Worker threads dedicated to transcription. OpenVINO releases the GIL during
+# inference, so threads keep the event loop free without duplicating the model.
+# Providers must therefore be safe to call from several threads at once; the
+# Whisper provider serialises generate() on its shared infer request.
+# With micro-batching on, each batch slot needs a thread waiting on it.
+_STT_WORKERS = int(os.getenv(
+    "STT_WORKERS",
+    str(max(min(2, os.cpu_count() or 1), int(os.getenv("STT_BATCH_MAX_SIZE", "1")))),
+))
+
+# Transcriptions allowed to be running or waiting at once; beyond this
+# requests are rejected immediately instead of piling up.
+_STT_MAX_QUEUE_DEPTH = int(os.getenv("STT_MAX_QUEUE_DEPTH", "8"))
+
+# Largest audio upload accepted by /transcribe; larger uploads are rejected
+# with 413 while they are still being received.
+MAX_AUDIO_SIZE_BYTES = int(os.getenv("MAX_AUDIO_SIZE_MB", "25")) * 1024 * 1024
 
 _stt_provider: SpeechToTextProvider | None = None
+_stt_executor = ThreadPoolExecutor(max_workers=_STT_WORKERS, thread_name_prefix="stt")
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+class TranscriptionQueueFull(RuntimeError):
+    """Raised when the transcription queue is at STT_MAX_QUEUE_DEPTH."""
 
 
 def get_speech_processor() -> SpeechToTextProvider:
@@ -21,3 +52,68 @@ def get_speech_processor() -> SpeechToTextProvider:
 def is_speech_model_ready() -> bool:
     """Return True when the STT provider has finished loading its model."""
     return _stt_provider is not None and _stt_provider.is_ready()
+
+
+def get_speech_model_status() -> dict:
+    """Return load/warm-up diagnostics from the STT provider (empty before startup)."""
+    return _stt_provider.get_status() if _stt_provider is not None else {}
+
+
+def get_queue_depth() -> int:
+    """Return the number of transcriptions currently running or queued."""
+    return _pending
+
+
+async def transcribe_async(audio_bytes: bytes, long_audio: bool = False) -> str:
+    """
+    Transcribe audio on the dedicated STT worker pool.
+
+    Takes ownership of a SpooledUpload: it is closed once the worker is done
+    with it (or straight away if the job is rejected), not when the caller
+    stops waiting, so a cancelled or timed-out request cannot delete the
+    file out from under a running transcription.
+
+    Args:
+        audio_bytes: Raw audio file bytes, or a SpooledUpload.
+        long_audio:  Use the provider's windowed long-recording path instead
+                     of a single-pass transcription.
+
+    Returns:
+        Transcribed text string.
+
+    Raises:
+        TranscriptionQueueFull: If STT_MAX_QUEUE_DEPTH jobs are already pending.
+    """
+    global _pending
+    with _pending_lock:
+        if _pending >= _STT_MAX_QUEUE_DEPTH:
+            close_upload(audio_bytes)
+            raise TranscriptionQueueFull(
+                f"Transcription queue is full ({_STT_MAX_QUEUE_DEPTH} pending)."
+            )
+        _pending += 1
+
+    try:
+        speech_processor = get_speech_processor()
+        transcribe = (
+            speech_processor.transcribe_long_audio_bytes
+            if long_audio
+            else speech_processor.transcribe_audio_bytes
+        )
+        future = _stt_executor.submit(transcribe, audio_bytes)
+    except BaseException:
+        _release_slot()
+        close_upload(audio_bytes)
+        raise
+    # The slot and the audio are held until the worker is done (or the job
+    # is cancelled before it starts), not until the caller stops waiting: a
+    # request that disconnects mid-transcription still occupies a worker.
+    future.add_done_callback(_release_slot)
+    future.add_done_callback(lambda _: close_upload(audio_bytes))
+    return await asyncio.wrap_future(future)
+
+
+def _release_slot(_future=None) -> None:
+    global _pending
+    with _pending_lock:
+        _pending -= 1
@@ -1,6 +1,11 @@
+import hashlib
 import os
+import threading
+import time
+from collections import OrderedDict
 
-from supabase import create_client, Client
+import httpx
+from supabase import create_client, Client, ClientOptions
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,8 +16,74 @@ _key: str = os.getenv("SUPABASE_KEY", "")
 if not _url or not _key:
     raise RuntimeError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables.")
 
+# User-scoped clients are kept for at most this long, up to this many at once.
+_USER_CLIENT_TTL = int(os.getenv("SUPABASE_USER_CLIENT_TTL_SECONDS", "300"))
+_USER_CLIENT_MAX_SIZE = int(os.getenv("SUPABASE_USER_CLIENT_MAX_SIZE", "256"))
+
 supabase: Client = create_client(_url, _key)
 
+# One connection pool shared by every user-scoped client. Each client still
+# gets its own httpx.Client (and therefore its own Authorization header) —
+# only the underlying TCP/TLS connections are shared.
+_shared_transport = httpx.HTTPTransport(
+    http2=True,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+)
+
+
+class UserClientPool:
+    """
+    Bounded, TTL-evicted pool of Supabase clients scoped to a user's JWT.
+
+    Keys are SHA-256 digests of the JWT, so raw tokens are never used as dict
+    keys. Clients are built on first use and dropped once they have been
+    alive for SUPABASE_USER_CLIENT_TTL_SECONDS or when the pool is full
+    (least recently used first).
+    """
+
+    def __init__(self, max_size: int = _USER_CLIENT_MAX_SIZE, ttl: int = _USER_CLIENT_TTL):
+        # Maps jwt digest -> (Client, created_at timestamp)
+        self._clients: "OrderedDict[str, tuple[Client, float]]" = OrderedDict()
+        self._max_size = max_size
+        self._ttl = ttl
+        self._lock = threading.Lock()
+
+    def get(self, jwt: str) -> Client:
+        """Return the pooled client for this JWT, creating it on a miss."""
+        key = hashlib.sha256(jwt.encode("utf-8")).hexdigest()
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry is not None and now - entry[1] <= self._ttl:
+                self._clients.move_to_end(key)
+                return entry[0]
+
+        client = _create_user_client(jwt)
+
+        with self._lock:
+            self._clients[key] = (client, now)
+            self._clients.move_to_end(key)
+            while len(self._clients) > self._max_size:
+                # Evicted clients are not closed: closing would shut down the
+                # shared transport. They hold no connections of their own.
+                self._clients.popitem(last=False)
+        return client
+
+
+def _create_user_client(jwt: str) -> Client:
+    """Build a Supabase client that sends the user's JWT on every request."""
+    options = ClientOptions(
+        headers={"Authorization": f"Bearer {jwt}"},
+        auto_refresh_token=False,
+        persist_session=False,
+        httpx_client=httpx.Client(transport=_shared_transport, follow_redirects=True),
+    )
+    return create_client(_url, _key, options=options)
+
+
+_user_client_pool = UserClientPool()
+
 
 def get_user_client(jwt: str) -> Client:
     """
@@ -22,12 +93,13 @@ def get_user_client(jwt: str) -> Client:
     policies are enforced. All reads and writes are scoped to that user's rows,
     preventing cross-user data access even if the application layer has a bug.
 
+    Clients are pooled per JWT (see UserClientPool) and share one HTTP
+    connection pool, so repeat calls within a session are a dict lookup.
+
     Args:
         jwt: The user's Supabase access token (from the Authorization header).
 
     Returns:
         A fully configured Supabase Client instance acting as that user.
     """
-    client: Client = create_client(_url, _key)
-    client.auth.set_session(access_token=jwt, refresh_token="")
-    return client
\ No newline at end of file
+    return _user_client_pool.get(jwt)
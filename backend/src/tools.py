@@ -1,12 +1,16 @@
 import os
+import asyncio
 import base64
+import hashlib
 import json
+from collections import OrderedDict
 
 from langchain.tools import tool
 from typing import Optional, Dict
 from google import genai
 from google.genai.types import GenerateContentConfig, Content, Part
 from dotenv import load_dotenv
+from postgrest.exceptions import APIError
 
 from .supabaseClient import get_user_client
 from .prompts import load_prompt
@@ -20,59 +24,124 @@ _IMAGE_GEN_SYSTEM_PROMPT = load_prompt("image_generation_system_prompt")
 _IMAGE_GEN_MODEL = os.getenv("IMAGE_GEN_MODEL", "gemini-2.0-flash-preview-image-generation")
 
 
-@tool
-def generate_image(description: str) -> str:
-    """
-    Generate an image based on a detailed text description using Gemini.
+# At most this many image generations run concurrently per process.
+_IMAGE_GEN_MAX_CONCURRENCY = int(os.getenv("IMAGE_GEN_MAX_CONCURRENCY", "4"))
 
-    Args:
-        description: Description of the image to generate.
+# Generated images are cached by normalised description (base64 strings).
+_IMAGE_CACHE_MAX_ENTRIES = int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "128"))
 
-    Returns:
-        A base64-encoded image string.
-    """
-    if not description or not description.strip():
-        return "Error: Description must not be empty."
+_genai_client: Optional[genai.Client] = None
+_image_semaphore = asyncio.Semaphore(_IMAGE_GEN_MAX_CONCURRENCY)
+_image_cache: "OrderedDict[str, str]" = OrderedDict()
+# Generations currently running, so identical concurrent requests share one call.
+_image_inflight: Dict[str, asyncio.Future] = {}
 
-    try:
+
+def _get_genai_client() -> Optional[genai.Client]:
+    """Return the process-wide Gemini client, creating it on first use."""
+    global _genai_client
+    if _genai_client is None:
         api_key = os.getenv("GOOGLE_API_KEY")
         if not api_key:
-            return "Error: Missing GOOGLE_API_KEY in environment."
+            return None
+        _genai_client = genai.Client(api_key=api_key)
+    return _genai_client
 
-        client = genai.Client(api_key=api_key)
 
-        combined_prompt = (
-            f"{_IMAGE_GEN_SYSTEM_PROMPT.strip()}\n\n"
-            f"Generate an image for: {description.strip()}"
-        )
+def _image_cache_key(description: str) -> str:
+    """Content address for a description: case, spacing and trailing punctuation ignored."""
+    normalised = " ".join(description.lower().split()).rstrip(".!?")
+    return hashlib.sha256(f"{_IMAGE_GEN_MODEL}\x00{normalised}".encode("utf-8")).hexdigest()
+
+
+async def _generate_image_uncached(description: str) -> str:
+    """Call the image model and return a base64 image or an "Error: ..." string."""
+    client = _get_genai_client()
+    if client is None:
+        return "Error: Missing GOOGLE_API_KEY in environment."
 
-        response = client.models.generate_content(
+    combined_prompt = (
+        f"{_IMAGE_GEN_SYSTEM_PROMPT.strip()}\n\n"
+        f"Generate an image for: {description.strip()}"
+    )
+
+    async with _image_semaphore:
+        response = await client.aio.models.generate_content(
             model=_IMAGE_GEN_MODEL,
             contents=[Content(role="user", parts=[Part(text=combined_prompt)])],
             config=GenerateContentConfig(response_modalities=["TEXT", "IMAGE"]),
         )
 
-        if not response or not response.candidates:
-            return "Error: No response received from the image generation model."
+    if not response or not response.candidates:
+        return "Error: No response received from the image generation model."
+
+    candidate = response.candidates[0]
+    if not candidate.content or not candidate.content.parts:
+        return "Error: No content parts in the response."
+
+    image_part = None
+    for part in candidate.content.parts:
+        if hasattr(part, "inline_data") and part.inline_data:
+            image_part = part
+            break
+
+    if not image_part:
+        return "Error: No image data found in the response."
+
+    return base64.b64encode(image_part.inline_data.data).decode("utf-8")
+
+
+@tool
+async def generate_image(description: str) -> str:
+    """
+    Generate an image based on a detailed text description using Gemini.
 
-        candidate = response.candidates[0]
-        if not candidate.content or not candidate.content.parts:
-            return "Error: No content parts in the response."
+    Args:
+        description: Description of the image to generate.
 
-        image_part = None
-        for part in candidate.content.parts:
-            if hasattr(part, "inline_data") and part.inline_data:
-                image_part = part
-                break
+    Returns:
+        A base64-encoded image string.
+    """
+    if not description or not description.strip():
+        return "Error: Description must not be empty."
 
-        if not image_part:
-            return "Error: No image data found in the response."
+    key = _image_cache_key(description)
 
-        encoded = base64.b64encode(image_part.inline_data.data).decode("utf-8")
-        return encoded
+    cached = _image_cache.get(key)
+    if cached is not None:
+        _image_cache.move_to_end(key)
+        return cached
 
+    inflight = _image_inflight.get(key)
+    if inflight is not None:
+        try:
+            return await asyncio.shield(inflight)
+        except asyncio.CancelledError:
+            if not inflight.cancelled():
+                raise
+            return "Error generating image: the original request was cancelled."
+
+    future = asyncio.get_running_loop().create_future()
+    _image_inflight[key] = future
+    try:
+        encoded = await _generate_image_uncached(description)
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
     except Exception as e:
-        return f"Error generating image: {str(e)}"
+        encoded = f"Error generating image: {str(e)}"
+    finally:
+        _image_inflight.pop(key, None)
+
+    future.set_result(encoded)
+
+    # Only successful generations are cached; errors are retried next time.
+    if not encoded.startswith("Error"):
+        _image_cache[key] = encoded
+        while len(_image_cache) > _IMAGE_CACHE_MAX_ENTRIES:
+            _image_cache.popitem(last=False)
+
+    return encoded
 
 
 # ---------------------------------------------------------------------------
@@ -156,6 +225,71 @@ def generate_quiz(content: str) -> Dict:
         return {"error": f"Error processing quiz: {str(e)}"}
 
 
+# Name of the Postgres function that appends one note atomically
+# (see supabase/migrations). Override via NOTES_APPEND_RPC env var.
+_NOTES_APPEND_RPC = os.getenv("NOTES_APPEND_RPC", "append_note")
+
+# PostgREST error code for "function not found in the schema cache".
+_RPC_NOT_FOUND = "PGRST202"
+
+# Flipped to False the first time the RPC is missing, so deployments that
+# have not applied the migration skip straight to the fallback path.
+_append_rpc_available = True
+
+
+def _append_note(user_client, user_id: str, note_data: dict) -> None:
+    """
+    Append a single note to the user's Notes row.
+
+    Uses the append_note RPC, which does a server-side jsonb append in one
+    round-trip: the request carries only the new note, and concurrent saves
+    cannot overwrite each other. Falls back to read-modify-write when the
+    RPC has not been deployed.
+    """
+    global _append_rpc_available
+
+    if _append_rpc_available:
+        try:
+            user_client.rpc(
+                _NOTES_APPEND_RPC,
+                {"p_user_id": user_id, "p_note": note_data},
+            ).execute()
+            return
+        except APIError as e:
+            if e.code != _RPC_NOT_FOUND:
+                raise
+            _append_rpc_available = False
+            print(
+                f"[save_notes] RPC '{_NOTES_APPEND_RPC}' not found — "
+                "falling back to read-modify-write. Apply the Supabase migration to enable atomic appends."
+            )
+
+    _append_note_read_modify_write(user_client, user_id, note_data)
+
+
+def _append_note_read_modify_write(user_client, user_id: str, note_data: dict) -> None:
+    """Legacy append: fetch the whole notes array and write it back."""
+    user_check = (
+        user_client.table("Notes")
+        .select("notes")
+        .eq("user_id", user_id)
+        .execute()
+    )
+
+    if not user_check.data:
+        user_client.table("Notes").insert({
+            "user_id": user_id,
+            "notes": [note_data],
+        }).execute()
+    else:
+        existing_notes = user_check.data[0].get("notes", [])
+        updated_notes = existing_notes + [note_data]
+
+        user_client.table("Notes").update({
+            "notes": updated_notes,
+        }).eq("user_id", user_id).execute()
+
+
 def make_save_notes_tool(jwt: str):
     """
     Factory that returns a `save_notes` tool bound to the calling user's JWT.
@@ -164,14 +298,15 @@ def make_save_notes_tool(jwt: str):
     the tool can only write to the row that belongs to the authenticated user,
     even if the application passes a wrong user_id by mistake.
 
+    The Supabase client is only resolved when the tool actually runs, so
+    binding the tool to the LLM on every chat turn costs nothing.
+
     Args:
         jwt: The user's Supabase access token.
 
     Returns:
         A LangChain tool that saves notes for that specific user.
     """
-    user_client = get_user_client(jwt)
-
     @tool
     def save_notes(data: str, user_id: str) -> str:
         """
@@ -197,25 +332,8 @@ def make_save_notes_tool(jwt: str):
                 return "Error: 'title' and 'content' fields are required in the data."
 
             # All queries go through the JWT-scoped client — RLS enforced.
-            user_check = (
-                user_client.table("Notes")
-                .select("notes")
-                .eq("user_id", user_id)
-                .execute()
-            )
-
-            if not user_check.data:
-                user_client.table("Notes").insert({
-                    "user_id": user_id,
-                    "notes": [note_data],
-                }).execute()
-            else:
-                existing_notes = user_check.data[0].get("notes", [])
-                updated_notes = existing_notes + [note_data]
-
-                user_client.table("Notes").update({
-                    "notes": updated_notes,
-                }).eq("user_id", user_id).execute()
+            user_client = get_user_client(jwt)
+            _append_note(user_client, user_id, note_data)
 
             return "Notes successfully saved to the database."
 
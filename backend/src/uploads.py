@@ -0,0 +1,126 @@
+"""
+uploads.py — size-capped, disk-spooled file uploads.
+
+`await file.read()` pulls an entire upload into memory before any size check
+runs. spool_upload() instead copies the upload to a temporary file in small
+pieces, aborting as soon as the limit is exceeded, and returns a
+SpooledUpload: a read-only, memory-mapped view of that file.
+
+SpooledUpload is bytes-like — len(), slicing, hashlib and anything else that
+accepts a buffer work on it without copying — and also exposes the file's
+path, so PyMuPDF and soundfile can read the document straight from disk.
+
+Configuration (read from environment):
+    UPLOAD_SPOOL_DIR - directory for spooled uploads (default: system temp)
+"""
+
+import io
+import mmap
+import os
+import tempfile
+from typing import Optional, Union
+
+from fastapi import UploadFile
+
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None
+
+# Bytes copied per read while spooling.
+_READ_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(ValueError):
+    """Raised when an upload exceeds its size limit."""
+
+    def __init__(self, limit: int):
+        super().__init__(f"Upload exceeds the {limit // (1024 * 1024)} MB limit.")
+        self.limit = limit
+
+
+class SpooledUpload:
+    """
+    An upload spooled to a temporary file, viewed through a read-only mmap.
+
+    Call close() (or use it as a context manager) once it is no longer
+    needed; that unmaps and deletes the file.
+    """
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+        self._file = open(path, "rb")
+        # mmap cannot map an empty file.
+        self._view: Union[mmap.mmap, bytes] = (
+            mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        )
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, index):
+        return self._view[index]
+
+    def __buffer__(self, flags: int) -> memoryview:
+        return memoryview(self._view)
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        if isinstance(self._view, mmap.mmap):
+            try:
+                self._view.close()
+            except BufferError:
+                # Still exported to a worker thread (e.g. a cancelled request
+                # mid-hash); the mapping goes away with the last reference.
+                pass
+        self._file.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "SpooledUpload":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def readable(data) -> Union[str, io.BytesIO]:
+    """
+    Something soundfile / PyAV can open: the spooled file's path for a
+    SpooledUpload, or a BytesIO over plain bytes.
+    """
+    return data.path if isinstance(data, SpooledUpload) else io.BytesIO(data)
+
+
+def close_upload(data) -> None:
+    """Release a SpooledUpload; a no-op for plain bytes."""
+    if isinstance(data, SpooledUpload):
+        data.close()
+
+
+async def spool_upload(file: UploadFile, max_bytes: int, suffix: Optional[str] = None) -> SpooledUpload:
+    """
+    Copy an upload to a temporary file, never holding more than _READ_SIZE
+    bytes of it in memory.
+
+    Raises:
+        UploadTooLarge: As soon as more than max_bytes have been read (or
+                        immediately, if the declared size is already larger).
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise UploadTooLarge(max_bytes)
+
+    fd, path = tempfile.mkstemp(prefix="upload-", suffix=suffix or "", dir=UPLOAD_SPOOL_DIR)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while piece := await file.read(_READ_SIZE):
+                size += len(piece)
+                if size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                out.write(piece)
+        return SpooledUpload(path, size)
+    except BaseException:
+        os.unlink(path)
+        raise
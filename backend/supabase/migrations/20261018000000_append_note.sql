@@ -0,0 +1,60 @@
+-- Atomic, constant-payload append for the save_notes tool.
+--
+-- Replaces the client-side read-modify-write of the whole "Notes".notes array:
+-- the caller sends only the new note, the append happens in a single
+-- statement, and concurrent saves for the same user serialise on the row lock
+-- instead of overwriting each other.
+--
+-- SECURITY INVOKER keeps Row-Level Security in force — the function can only
+-- touch rows the calling user's JWT already grants access to.
+
+-- The read-modify-write path could leave several rows for one user. Merge
+-- them into the earliest row (notes concatenated in row order) so the unique
+-- index below can be built on existing data.
+lock table public."Notes" in share row exclusive mode;
+
+with elements as (
+  select n.id, n.user_id, e.note, e.ord
+  from public."Notes" n
+  left join lateral jsonb_array_elements(
+    case
+      when n.notes is null then '[]'::jsonb
+      when jsonb_typeof(n.notes::jsonb) = 'array' then n.notes::jsonb
+      else jsonb_build_array(n.notes::jsonb)
+    end
+  ) with ordinality as e(note, ord) on true
+),
+merged as (
+  select
+    user_id,
+    min(id) as keep_id,
+    coalesce(jsonb_agg(note order by id, ord) filter (where note is not null), '[]'::jsonb) as notes
+  from elements
+  group by user_id
+  having count(distinct id) > 1
+),
+kept as (
+  update public."Notes" n
+  set notes = m.notes
+  from merged m
+  where n.id = m.keep_id
+  returning n.id
+)
+delete from public."Notes" n
+using merged m
+where n.user_id = m.user_id and n.id <> m.keep_id;
+
+create unique index if not exists "Notes_user_id_key" on public."Notes" (user_id);
+
+create or replace function public.append_note(p_user_id uuid, p_note jsonb)
+returns void
+language sql
+security invoker
+as $$
+  insert into public."Notes" (user_id, notes)
+  values (p_user_id, jsonb_build_array(p_note))
+  on conflict (user_id)
+  do update set notes = coalesce(public."Notes".notes::jsonb, '[]'::jsonb) || excluded.notes::jsonb;
+$$;
+
+grant execute on function public.append_note(uuid, jsonb) to authenticated;
@@ -0,0 +1,49 @@
+"""
+Relevance scores must agree between the Chroma and NumPy backends, so that
+RAG_SIMILARITY_THRESHOLD filters the same chunks under either.
+
+Run from backend/:
+    uv run --with pytest python -m pytest tests
+"""
+
+import chromadb
+import numpy as np
+import pytest
+
+from src.rag import vector_store
+from src.rag.numpy_index import NumpyVectorIndex
+
+
+def _unit_vectors(n: int, dim: int, seed: int) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def test_numpy_scores_match_chroma_l2():
+    corpus = _unit_vectors(50, 32, seed=0)
+    query = _unit_vectors(1, 32, seed=1)[0]
+    # Pull one chunk close to the query so scores span both sides of the threshold.
+    corpus[0] = 0.8 * query + 0.6 * corpus[0]
+    corpus[0] /= np.linalg.norm(corpus[0])
+    texts = [f"chunk {i}" for i in range(len(corpus))]
+
+    collection = chromadb.EphemeralClient().get_or_create_collection(
+        "user_scores", metadata={"hnsw:space": "l2"}
+    )
+    collection.add(ids=texts, documents=texts, embeddings=corpus)
+    response = collection.query(
+        query_embeddings=[query], n_results=5, include=["documents", "distances"]
+    )
+    chroma_scores = {
+        text: vector_store._relevance_score(distance, "l2")
+        for text, distance in zip(response["documents"][0], response["distances"][0])
+    }
+
+    index = NumpyVectorIndex("float32")
+    index.add("scores", texts, [{"source": "test.pdf"} for _ in texts], corpus)
+    numpy_scores = {text: score for text, _, score in index.search("scores", query, 5)}
+
+    assert numpy_scores.keys() == chroma_scores.keys()
+    for text, score in chroma_scores.items():
+        assert numpy_scores[text] == pytest.approx(score, abs=1e-4)
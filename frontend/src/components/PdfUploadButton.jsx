@@ -3,12 +3,16 @@ import { FileText, X, Loader2 } from 'lucide-react';
 
 const MAX_PDF_COUNT = 2;
 const MAX_PDF_SIZE_MB = 10;
+const JOB_POLL_INTERVAL_MS = 1000;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
 
 /**
  * PdfUploadButton
  *
  * A self-contained PDF upload button. It enforces client-side validation
- * (file type, size, count) before POSTing to /upload-pdf as multipart form data.
+ * (file type, size, count) before POSTing to /upload-pdf as multipart form data,
+ * then polls the returned ingestion job until the PDF has been processed.
  *
  * Props:
  *   accessToken  {string}    - Bearer token for auth header
@@ -74,8 +78,25 @@ const PdfUploadButton = ({
         throw new Error(err.detail || `Upload failed (${res.status})`);
       }
 
-      const data = await res.json();
-      onUploadSuccess?.(data);
+      // The server queues the PDF and returns a job id; wait for it to finish.
+      const { job_id: jobId } = await res.json();
+      for (;;) {
+        await sleep(JOB_POLL_INTERVAL_MS);
+        const jobRes = await fetch(`http://localhost:8000/upload-pdf/jobs/${jobId}`, {
+          headers: { Authorization: `Bearer ${accessToken}` },
+        });
+        if (!jobRes.ok) {
+          throw new Error(`Upload status check failed (${jobRes.status})`);
+        }
+        const job = await jobRes.json();
+        if (job.status === 'done') {
+          onUploadSuccess?.(job.result);
+          break;
+        }
+        if (job.status === 'failed') {
+          throw new Error(job.error || 'Upload failed');
+        }
+      }
     } catch (err) {
       onUploadError?.(err.message);
     } finally {